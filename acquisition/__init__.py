@@ -0,0 +1,11 @@
+"""Sensor acquisition drivers shared by the command line logger and the GUI.
+
+Each driver is a ``SensorDriver``: it supplies the transport and decoder,
+the base class runs the read, parse and write threads and the display
+queue. Drivers are imported from their modules (``acquisition.ublox``,
+``acquisition.witmotion``, ``acquisition.microstrain``) so only the
+hardware libraries that are needed get loaded.
+"""
+from .driver import SensorDriver, CsvWriter
+from .buffers import StageBuffer
+from .records import Record, record_type
@@ -0,0 +1,104 @@
+"""Columnar recording: Arrow IPC stream files, optionally converted to Parquet.
+
+``ArrowWriter`` is a drop-in for ``CsvWriter`` with the same flush and
+fsync policy. Rows are gathered into typed columns and written as record
+batches, so numbers are never formatted as text and the files load
+straight into pandas/polars (``pyarrow.ipc.open_stream(path).read_pandas()``). Columns follow the
+same rule as the shared ring: strings for the driver's ``text_fields``
+(``dt.text_fields`` by default), float64 for the rest. pyarrow is only imported when an Arrow writer is created.
+"""
+import os
+
+import pyarrow as pa
+
+from . import datatypes as dt
+from .buffers import BLOCK
+from .driver import (FileWriter, BUFFER_SIZE, WRITE_BATCH,
+                     format_value, number_value)
+
+
+PARQUET_ROW_GROUP = 100000
+
+
+def arrow_schema(columns, text_fields=dt.text_fields):
+    return pa.schema([(name, pa.string() if name in text_fields else pa.float64())
+                      for name in columns])
+
+
+def convert_to_parquet(path, row_group_size=PARQUET_ROW_GROUP, compression="snappy"):
+    """Write ``<path>.parquet`` next to an Arrow stream file, a row group at a time"""
+    import pyarrow.parquet as pq
+
+    parquet_path = os.path.splitext(path)[0] + ".parquet"
+    with pa.OSFile(path, "rb") as source:
+        reader = pa.ipc.open_stream(source)
+        with pq.ParquetWriter(parquet_path, reader.schema, compression=compression) as writer:
+            batches, rows = [], 0
+            for batch in reader:
+                batches.append(batch)
+                rows += batch.num_rows
+                if rows >= row_group_size:
+                    writer.write_table(pa.Table.from_batches(batches, reader.schema))
+                    batches, rows = [], 0
+            if batches:
+                writer.write_table(pa.Table.from_batches(batches, reader.schema))
+    return parquet_path
+
+
+class ArrowWriter(FileWriter):
+    """Arrow IPC stream file; each write is one record batch.
+
+    The stream goes through a ``flush_bytes`` file buffer, so a batch
+    reaches the disk in large writes. With ``parquet`` set, ``close`` also
+    converts the finished stream to Parquet. ``compression="zstd"`` uses
+    Arrow's own buffer compression, so each record batch stays
+    independently readable; Parquet files use the same codec.
+    """
+
+    def __init__(self, path, columns, batch=WRITE_BATCH, buffer_size=BUFFER_SIZE,
+                 on_error=print, policy=BLOCK, spill_dir=None, parquet=False,
+                 compression=None, text_fields=dt.text_fields, **flush):
+        if compression not in (None, "zstd"):
+            raise ValueError(f"Arrow streams support zstd compression, not {compression!r}")
+        super().__init__(path, batch, buffer_size, on_error, policy, spill_dir, **flush)
+        self.parquet = parquet
+        self.compression = compression
+        self.schema = arrow_schema(columns, text_fields)
+        self._text = [name in text_fields for name in self.schema.names]
+        self._columns = [[] for _ in self._text]
+
+        self._file = open(path, "wb", buffering=self.flush_bytes)
+        self._writer = pa.ipc.new_stream(
+            self._file, self.schema,
+            options=pa.ipc.IpcWriteOptions(compression=compression))
+
+    def _append(self, row):
+        for column, is_text, value in zip(self._columns, self._text, row.values()):
+            column.append(format_value(value) if is_text else number_value(value))
+
+    def _append_batch(self, records):
+        for column, is_text, name in zip(self._columns, self._text, self.schema.names):
+            values = records[name].tolist()
+            column.extend([value.decode() for value in values] if is_text else values)
+
+    def _pending_bytes(self):
+        return 8 * self._rows * len(self._columns)     # Close enough for text columns
+
+    def _write(self):
+        start = self._file.tell()
+        arrays = [pa.array(column, type=field.type)
+                  for column, field in zip(self._columns, self.schema)]
+        for column in self._columns:
+            column.clear()
+        self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self._file.flush()
+        return self._file.tell() - start
+
+    def _close_file(self):
+        self._writer.close()
+        self._file.close()
+        if self.parquet:
+            try:
+                convert_to_parquet(self.path, compression=self.compression or "snappy")
+            except Exception as e:
+                self._on_error(f"Error converting {self.path} to Parquet: {e}")
@@ -0,0 +1,130 @@
+"""Bounded buffers between the read, parse and save stages of a driver.
+
+A ``StageBuffer`` never holds more than ``maxsize`` items in memory. When
+it is full, its policy decides what happens to the next item:
+
+- ``block``: the producer waits for room. Nothing is lost, but a stalled
+  consumer (an SD card that stops accepting writes) stalls the producer.
+- ``drop-oldest``: the oldest item is discarded and counted in ``dropped``.
+- ``spill``: items overflow to an unlinked temporary file in ``spill_dir``
+  (the system temp directory if None, which may be in RAM) and come back
+  in order once the consumer catches up. Items must be picklable.
+
+``high_water`` is the most items the buffer held in memory at once.
+"""
+import os
+import time
+import pickle
+import tempfile
+import threading
+
+from queue import Empty
+from collections import deque
+
+
+BLOCK = "block"
+DROP_OLDEST = "drop-oldest"
+SPILL = "spill"
+POLICIES = (BLOCK, DROP_OLDEST, SPILL)
+
+
+class StageBuffer():
+    """Thread-safe FIFO with a fixed memory bound and an overflow policy"""
+
+    def __init__(self, maxsize, policy=BLOCK, spill_dir=None, name="buffer"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown buffer policy {policy!r}, "
+                             f"expected one of {', '.join(POLICIES)}")
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.spill_dir = spill_dir
+
+        self.high_water = 0
+        self.dropped = 0
+        self.spilled = 0
+
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+        self._spill = None          # Opened on the first overflow
+        self._spill_pending = 0     # Items on disk not read back yet
+        self._spill_write = 0
+        self._spill_read = 0
+
+    def put(self, item):
+        with self._lock:
+            full = len(self._items) >= self.maxsize
+            # Once items are on disk, newer ones follow them there to keep the order
+            if self.policy == SPILL and (full or self._spill_pending):
+                self._spill_item(item)
+            else:
+                if full and self.policy == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                while len(self._items) >= self.maxsize:
+                    self._not_full.wait()
+                self._items.append(item)
+                self.high_water = max(self.high_water, len(self._items))
+            self._not_empty.notify()
+
+    def get(self, timeout=None):
+        """Oldest item; raises queue.Empty if none arrives within ``timeout`` seconds"""
+        with self._lock:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._items and not self._spill_pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise Empty
+                self._not_empty.wait(remaining)
+            item = self._items.popleft() if self._items else self._unspill_item()
+            self._not_full.notify()
+            return item
+
+    def qsize(self):
+        """Items waiting, in memory and on disk"""
+        with self._lock:
+            return len(self._items) + self._spill_pending
+
+    def stats(self):
+        return {
+            "policy": self.policy,
+            "size": self.maxsize,
+            "high_water": self.high_water,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+        }
+
+    def close(self):
+        """Discard the spill file (anything left in it is lost)"""
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+                self._spill_pending = 0
+
+    def _spill_item(self, item):
+        if self._spill is None:
+            if self.spill_dir:
+                os.makedirs(self.spill_dir, exist_ok=True)
+            self._spill = tempfile.TemporaryFile(
+                prefix=f"{self.name}_spill_", dir=self.spill_dir)
+        self._spill.seek(self._spill_write)
+        pickle.dump(item, self._spill, pickle.HIGHEST_PROTOCOL)
+        self._spill_write = self._spill.tell()
+        self._spill_pending += 1
+        self.spilled += 1
+
+    def _unspill_item(self):
+        self._spill.seek(self._spill_read)
+        item = pickle.load(self._spill)
+        self._spill_read = self._spill.tell()
+        self._spill_pending -= 1
+        if not self._spill_pending:
+            # Caught up: start the file over so it does not grow for the whole session
+            self._spill.seek(0)
+            self._spill.truncate()
+            self._spill_write = self._spill_read = 0
+        return item
@@ -0,0 +1,199 @@
+"""Recordings compressed as they are written, in seekable frames.
+
+``CompressedFile`` stands in for the binary file of a writer: ``write``
+hands the data to a worker thread that compresses it with gzip or zstd
+and writes it out, so compression never holds up the save thread. The
+output is a run of independent frames (gzip members or zstd frames) of
+about ``frame_size`` input bytes or ``frame_interval`` seconds each;
+together they are an ordinary .gz/.zst file that ``gzip -d``, ``zstd -d``
+and pandas read as is. Every write is flushed to a block boundary within
+its frame, so what reached the disk can still be decoded after a power
+cut.
+
+``<name>_frames.csv`` lists the frames: the systemepoch of the first row
+in each, its offset in the compressed file and its offset in the
+uncompressed data. A frame is listed once its first row with an epoch
+arrives, so the first frame, which opens with the CSV header, carries
+the time of the first data row. ``read_frames`` uses it to decompress from a given
+time onwards without reading the file from the start. zstd needs the
+``zstandard`` package, imported when a zstd file is opened.
+"""
+import os
+import csv
+import time
+import zlib
+import threading
+
+from queue import Queue
+
+
+CODECS = {"gzip": "gz", "zstd": "zst"}    # file extensions
+FRAME_SIZE = 4 * 1024 * 1024    # input bytes per frame, the seek granularity...
+FRAME_INTERVAL = 60             # ...or seconds, for slow streams
+PENDING_WRITES = 16             # writes queued for the worker before write() blocks
+
+
+class _GzipFrame():
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION if level is None else level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _ZstdFrame():
+    def __init__(self, level):
+        import zstandard
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._compressor = zstandard.ZstdCompressor(
+            level=3 if level is None else level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(self._flush_block)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+FRAMES = {"gzip": _GzipFrame, "zstd": _ZstdFrame}
+
+
+def frame_index_path(path):
+    """``<name>_frames.csv`` for ``<name>.<ext>.<gz|zst>``"""
+    base = os.path.splitext(path)[0]
+    return f"{os.path.splitext(base)[0]}_frames.csv"
+
+
+class CompressedFile():
+    """Write-only binary file compressed into frames by a worker thread"""
+
+    def __init__(self, path, codec="zstd", level=None, frame_size=FRAME_SIZE,
+                 frame_interval=FRAME_INTERVAL):
+        if codec not in FRAMES:
+            raise ValueError(f"Unknown compression {codec!r}, expected one of {', '.join(FRAMES)}")
+        self.path = path
+        self.codec = codec
+        self.level = level
+        self.frame_size = frame_size
+        self.frame_interval = frame_interval
+        FRAMES[codec](level)    # Fail now if the codec is not available
+
+        self._file = open(path, "wb")
+        self._index = open(frame_index_path(path), "w", buffering=1)
+        self._index.write("systemepoch,offset,raw_offset\n")
+        self._frame = None
+        self._frame_offsets = None  # (offset, raw_offset) of a frame not indexed yet
+        self._frame_input = 0
+        self._frame_start = 0
+        self._raw_offset = 0
+        self._error = None
+
+        self._queue = Queue(PENDING_WRITES)
+        self._thread = threading.Thread(target=self._compress_loop)
+        self._thread.start()
+
+    def write(self, data, epoch=None):
+        """Queue ``data`` (copied) for compression; ``epoch`` is the time of its first row"""
+        self._raise_error()
+        data = bytes(data)
+        self._queue.put((data, epoch))
+        return len(data)
+
+    def flush(self):
+        """Wait until everything written so far is compressed and handed to the OS"""
+        self._queue.join()
+        self._raise_error()
+        self._file.flush()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._file.close()
+        self._index.close()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _index_frame(self, epoch):
+        """List the open frame in the index, if it is not yet; ``epoch`` None leaves it blank"""
+        if self._frame_offsets is not None:
+            offset, raw_offset = self._frame_offsets
+            self._index.write(f"{'' if epoch is None else epoch},{offset},{raw_offset}\n")
+            self._frame_offsets = None
+
+    def _compress_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    if self._frame is not None:
+                        self._index_frame(None)
+                        self._file.write(self._frame.finish())
+                    break
+                data, epoch = item
+                if self._frame is None:
+                    self._frame = FRAMES[self.codec](self.level)
+                    self._frame_start = time.monotonic()
+                    self._frame_offsets = (self._file.tell(), self._raw_offset)
+                if epoch is not None:
+                    self._index_frame(epoch)
+                out = self._frame.compress(data)
+                self._raw_offset += len(data)
+                self._frame_input += len(data)
+                if (self._frame_input >= self.frame_size or
+                        time.monotonic() - self._frame_start >= self.frame_interval):
+                    self._index_frame(None)
+                    out += self._frame.finish()
+                    self._frame = None
+                    self._frame_input = 0
+                self._file.write(out)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+
+def read_frames(path, since=None, chunk_size=1024 * 1024):
+    """Decompressed data from the frame holding epoch ``since`` (the start if None) to the end"""
+    offset = 0
+    if since is not None:
+        with open(frame_index_path(path), newline="") as f:
+            for frame in csv.DictReader(f):
+                if frame["systemepoch"] and float(frame["systemepoch"]) > since:
+                    break
+                offset = int(frame["offset"])
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        if path.endswith("." + CODECS["zstd"]):
+            import zstandard
+            reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+            while True:
+                data = reader.read(chunk_size)
+                if not data:
+                    return
+                yield data
+
+        decompressor = zlib.decompressobj(31)
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                return
+            while data:
+                yield decompressor.decompress(data)
+                if not decompressor.eof:
+                    break
+                # Next gzip member
+                data = decompressor.unused_data
+                decompressor = zlib.decompressobj(31)
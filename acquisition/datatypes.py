@@ -33,6 +33,37 @@ imu_template = {
     "qW": None,
 }
 
+witmotion_template = {
+    "magX": None,       # Magnetic field (raw sensor counts)
+    "magY": None,
+    "magZ": None,
+    "pressure": None,   # Barometric pressure in Pa
+    "height": None,     # Barometric altitude in m
+    "gpsLon": None,     # WitMotion GPS module position in degrees
+    "gpsLat": None,
+    "gpsHeight": None,  # m
+    "gpsYaw": None,     # deg
+    "gpsSpeed": None,   # km/h
+}
+
+esf_template = {
+    "sensortime": None,     # ESF sensor time tag (ms for ESF-MEAS)
+    "source": None,         # MEAS or RAW
+    "gyroX": None,          # Angular velocity (in rad/s)
+    "gyroY": None,
+    "gyroZ": None,
+    "accX": None,           # Acceleration in m/s^2
+    "accY": None,
+    "accZ": None,
+    "gyroTemp": None,       # deg C
+    "wheelTicksFL": None,   # Wheel tick counters, negative when reversing
+    "wheelTicksFR": None,
+    "wheelTicksRL": None,
+    "wheelTicksRR": None,
+    "speedTicks": None,
+    "wheelSpeed": None,     # m/s
+}
+
 status_template = {
     "diffage": None,
     "diffstation": None,
@@ -61,3 +92,11 @@ calib_status_template = {
     "accY_calib": "Not Calibrated",
     "accZ_calib": "Not Calibrated",
 }
+
+# Columns holding text rather than numbers, for binary record layouts
+text_fields = {
+    "systemtime", "gpstime", "imutime", "source", "diffstation",
+    "imuStatus", "gpsFix", *calib_status_template,
+}
+# The IMUs that stamp samples with a device time number instead of an ISO time
+device_time_text_fields = text_fields - {"imutime"}
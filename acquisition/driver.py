@@ -0,0 +1,641 @@
+import os
+import time
+import signal
+import threading
+
+from queue import Empty
+from . import datatypes as dt
+from .buffers import StageBuffer, BLOCK
+
+
+BUFFER_SIZE = 10000     # items held between the reader and the decoder
+WRITE_BATCH = 1000      # rows collected before a write to a file
+FLUSH_BYTES = 256 * 1024    # bytes collected before a write
+FLUSH_INTERVAL = 1.0    # s a row may wait to be written
+FSYNC_INTERVAL = 5.0    # s written data may wait in the page cache
+READ_BACKOFF = 1.0      # s, longest pause between reads that keep failing
+SAVE_FORMATS = {"csv": "csv", "arrow": "arrows", "parquet": "arrows"}   # file extensions
+
+
+def format_value(value):
+    """CSV/display text of a row value: numbers formatted, None and NaN empty"""
+    if value is None or value != value:     # NaN: a field the device did not send
+        return ""
+    return value if isinstance(value, str) else str(value)
+
+
+def format_row(row):
+    return {k: format_value(v) for k, v in row.items()}
+
+
+def format_records(records):
+    """CSV text values of the rows of a structured array (see ``record_dtype``)"""
+    columns = []
+    for name in records.dtype.names:
+        values = records[name].tolist()
+        if records.dtype[name].kind == "S":
+            columns.append([value.decode() for value in values])
+        else:
+            columns.append(list(map(format_value, values)))
+    return zip(*columns)
+
+
+def number_value(value):
+    """Float of a row value, NaN if empty or not a number"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def next_path(base_dir, name, extension="csv"):
+    """First ``<name>_<n>.<extension>`` in ``base_dir`` that does not exist yet"""
+    count = 1
+    while True:
+        full_path = os.path.join(base_dir, f"{name}_{count}.{extension}")
+        if not os.path.exists(full_path):
+            return full_path
+        count += 1
+
+
+class FileWriter():
+    """Rows fed through a StageBuffer to a file written by its own thread.
+
+    Pending rows are written when ``batch`` rows or ``flush_bytes`` bytes
+    have collected, or ``flush_interval`` seconds after the first of them,
+    whichever comes first; the file is fsynced ``fsync_interval`` seconds
+    after a write (0: only on close). A power cut therefore loses at most
+    about ``flush_interval + fsync_interval`` seconds of data. ``policy``
+    is the StageBuffer policy applied when the file falls behind.
+
+    Items put on the writer are rows or structured arrays of rows (see
+    ``SensorDriver.emit_batch``). Subclasses open ``self._file`` and
+    implement ``_append(row)``, ``_append_batch(records)``,
+    ``_pending_bytes()`` and ``_write()`` (which returns the bytes written).
+    """
+
+    def __init__(self, path, batch=WRITE_BATCH, buffer_size=BUFFER_SIZE,
+                 on_error=print, policy=BLOCK, spill_dir=None, flush_bytes=FLUSH_BYTES,
+                 flush_interval=FLUSH_INTERVAL, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.batch = batch
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self._on_error = on_error
+        self.buffer = StageBuffer(buffer_size, policy, spill_dir,
+                                  name=os.path.basename(path))
+        self._thread = None
+        self._file = None
+        self._rows = 0              # Rows appended since the last write
+        self._first_row = 0         # monotonic time of the oldest of them
+        self._written = None        # monotonic time of the last unsynced write
+
+        self.rows = 0
+        self.bytes = 0
+        self.writes = 0
+        self.syncs = 0
+        self.write_seconds = 0.0
+        self.max_latency = 0.0
+        self._started = time.monotonic()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._write_rows)
+        self._thread.start()
+
+    def put(self, row):
+        self.buffer.put(row)
+
+    def close(self):
+        if isinstance(self._thread, threading.Thread) and self._thread.is_alive():
+            self.buffer.put(None)
+            self._thread.join()
+        self.buffer.close()
+        if self._file is not None:
+            self._close_file()
+            self._file = None
+
+    def stats(self):
+        """Bytes and rows written, number of writes and fsyncs, write latency"""
+        elapsed = time.monotonic() - self._started
+        return {
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "writes": self.writes,
+            "syncs": self.syncs,
+            "bytes_per_second": self.bytes / elapsed if elapsed > 0 else 0.0,
+            "mean_latency": self.write_seconds / self.writes if self.writes else 0.0,
+            "max_latency": self.max_latency,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+    def _write_rows(self):
+        while True:
+            try:
+                row = self.buffer.get(timeout=self._next_deadline())
+            except Empty:
+                row = ()
+            if row is None:
+                break
+            try:
+                if len(row):
+                    if not self._rows:
+                        self._first_row = time.monotonic()
+                    if getattr(row, "ndim", 0):     # Structured array of rows
+                        self._append_batch(row)
+                        self._rows += len(row)
+                    else:
+                        self._append(row)
+                        self._rows += 1
+                now = time.monotonic()
+                if self._rows and (self._rows >= self.batch or
+                                   self._pending_bytes() >= self.flush_bytes or
+                                   now - self._first_row >= self.flush_interval):
+                    self._flush()
+                elif self._written is not None and self.fsync_interval and \
+                        now - self._written >= self.fsync_interval:
+                    self._sync()
+            except Exception as e:
+                self._on_error(f"Error writing to file: {e}")
+
+        # Write and sync what is left when the thread stops
+        try:
+            if self._rows:
+                self._flush()
+            if self._written is not None:
+                self._sync()
+        except Exception as e:
+            self._on_error(f"Error writing to file: {e}")
+
+    def _next_deadline(self):
+        """Seconds until pending rows must be written or written data synced"""
+        deadlines = []
+        if self._rows:
+            deadlines.append(self._first_row + self.flush_interval)
+        if self._written is not None and self.fsync_interval:
+            deadlines.append(self._written + self.fsync_interval)
+        if not deadlines:
+            return None
+        return max(0, min(deadlines) - time.monotonic())
+
+    def _flush(self):
+        start = time.perf_counter()
+        self.bytes += self._write()
+        latency = time.perf_counter() - start
+        self.rows += self._rows
+        self._rows = 0
+        self.writes += 1
+        self.write_seconds += latency
+        self.max_latency = max(self.max_latency, latency)
+        if self._written is None:
+            self._written = time.monotonic()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.syncs += 1
+        self._written = None
+
+    def _close_file(self):
+        self._file.close()
+
+
+class CsvWriter(FileWriter):
+    """CSV file; rows are dicts in header order, formatted with
+    ``format_value`` on the writer thread (structured arrays column by
+    column with ``format_records``).
+
+    The header is written on construction (raising if the file cannot be
+    created). Lines are encoded into a preallocated ``flush_bytes`` buffer
+    that goes to the unbuffered file in a single write. With
+    ``compression`` ("gzip" or "zstd") the file is a ``CompressedFile``,
+    indexed by the systemepoch of the first row of each write.
+    """
+
+    def __init__(self, path, columns, batch=WRITE_BATCH, buffer_size=BUFFER_SIZE,
+                 on_error=print, policy=BLOCK, spill_dir=None, compression=None, **flush):
+        super().__init__(path, batch, buffer_size, on_error, policy, spill_dir, **flush)
+        self.compression = compression
+        self._chunk = bytearray(self.flush_bytes)
+        self._view = memoryview(self._chunk)
+        self._used = 0
+        self._chunk_epoch = None
+        self._epoch_column = columns.index("systemepoch") if "systemepoch" in columns else None
+
+        if compression:
+            from .compression import CompressedFile
+            self._file = CompressedFile(path, compression)
+        else:
+            self._file = open(path, "wb", buffering=0)
+        self._file.write((",".join(columns) + "\n").encode())
+
+    def _append(self, row):
+        self._append_values(list(map(format_value, row.values())))
+
+    def _append_batch(self, records):
+        for values in format_records(records):
+            self._append_values(values)
+
+    def _append_values(self, values):
+        line = (",".join(values) + "\n").encode()
+        if self._used + len(line) > len(self._chunk):
+            self._flush()       # No room left: write what is there first
+        if not self._used and self._epoch_column is not None:
+            self._chunk_epoch = values[self._epoch_column]
+        if len(line) > len(self._chunk):
+            # Longer than the whole buffer: write it on its own
+            if self.compression:
+                self.bytes += self._file.write(line, self._chunk_epoch)
+            else:
+                self.bytes += self._file.write(line)
+            return
+        self._chunk[self._used:self._used + len(line)] = line
+        self._used += len(line)
+
+    def _pending_bytes(self):
+        return self._used
+
+    def _write(self):
+        if self.compression:
+            written = self._file.write(self._view[:self._used], self._chunk_epoch)
+        else:
+            written = self._file.write(self._view[:self._used])
+        self._used = 0
+        return written
+
+
+class SensorDriver():
+    """Read, decode, save and publish pipeline shared by the sensor drivers.
+
+    A subclass supplies the transport and the decoder:
+
+    - ``open()`` connects to the device (raising on failure) and
+      ``close()`` releases it; ``interrupt()`` wakes a blocking ``read``.
+    - ``read()`` returns the items that arrived, an empty sequence if none.
+      It runs on the reader thread; every item is queued for ``decode``.
+      An OSError (the port went away) stops the driver; other errors are
+      reported and retried with a growing pause, up to ``READ_BACKOFF``.
+    - ``decode(item)`` runs on the parse thread and passes finished rows to
+      ``emit``; ``flush()`` is called once the last item has been decoded.
+
+    The driver owns the threads, the bounded buffers between them, the CSV
+    writers and the display channel. Like the drivers before it, it is
+    meant to be the target of a ``multiprocessing.Process``: the subclass
+    calls ``start()`` at the end of ``__init__``, which blocks until the
+    driver is stopped (SIGTERM from ``Process.terminate()`` and SIGINT
+    included) and then calls ``stop()``. Every ``display_timer`` seconds,
+    if a row was emitted since the last check, it writes ``publish()`` to
+    the ``Snapshot`` named in the ``snapshot`` kwarg (or puts it on
+    ``<kind>_queue``).
+
+    The buffers are StageBuffers of ``buffer_size`` items. ``buffer_policy``
+    chooses what happens when one fills up: a policy name for every stage,
+    or a dict by stage (``"raw"`` between read and parse, ``"write"``
+    between parse and the CSV files). Spill files go to ``spill_path``.
+    Drops and spills are reported when the driver stops.
+
+    ``save_format`` chooses the files: ``"csv"`` (the default), ``"arrow"``
+    for Arrow IPC streams (``ArrowWriter``, needs pyarrow) or
+    ``"parquet"`` for Arrow streams converted to Parquet when the driver
+    stops. ``write_batch``, ``flush_bytes``, ``flush_interval`` and
+    ``fsync_interval`` set when the files are written and synced (see
+    FileWriter); their statistics are printed when the driver stops.
+    ``compression`` ("gzip" or "zstd") compresses CSV files in seekable
+    frames on a worker thread (``compression.py``) and Arrow/Parquet files
+    with their own zstd codec. Rows may hold numbers and None; they are
+    only turned into text for CSV files and the display. Rows are ``record_type`` records (see
+    ``records.py``) when the subclass sets one, dicts of ``template``
+    otherwise.
+
+    Given the name of a ``SharedRing`` of ``record_dtype()`` records in the
+    ``ring`` kwarg, every row is also appended to it, so consumers in other
+    processes see every sample rather than the displayed ones.
+    """
+    name = "sensor"             # CSV file name prefix
+    kind = "imu"                # the <kind>_queue and <kind>_error_queue kwargs
+    write_batch = WRITE_BATCH
+    template = {}
+    record_type = None          # Record class of the rows, replaces template
+
+    def __init__(self, **kwargs):
+        self.save_data = kwargs.get("save_data", False)
+        self.save_path = kwargs.get("save_path", None)
+        self.queue = kwargs.get(f"{self.kind}_queue", None)
+        self.error_queue = kwargs.get(f"{self.kind}_error_queue", None)
+        self.display_timer = kwargs.get("display_timer", 1)
+        self.buffer_size = kwargs.get("buffer_size", BUFFER_SIZE)
+        self.buffer_policy = kwargs.get("buffer_policy", BLOCK)
+        self.spill_path = kwargs.get("spill_path", None)
+        self.save_format = kwargs.get("save_format", "csv")
+        self.compression = kwargs.get("compression", None)
+        if self.save_format != "csv" and self.compression not in (None, "zstd"):
+            self.report_error(f"{self.save_format} files only support zstd compression, "
+                              f"writing them uncompressed")
+            self.compression = None
+        self.write_batch = kwargs.get("write_batch", self.write_batch)
+        self.flush_policy = {
+            "flush_bytes": kwargs.get("flush_bytes", FLUSH_BYTES),
+            "flush_interval": kwargs.get("flush_interval", FLUSH_INTERVAL),
+            "fsync_interval": kwargs.get("fsync_interval", FSYNC_INTERVAL),
+        }
+        self.ring = None
+        self.snapshot = None
+
+        self._stop_event = threading.Event()
+        self._stopped = False
+        self._rawbuffer = StageBuffer(self.buffer_size, self.stage_policy("raw"),
+                                      self.spill_path, name=f"{self.name}_raw")
+        self._raw_data_thread = None
+        self._parse_thread = None
+        self._writers = []
+
+        self._current_data = self.new_record()
+        self._last_data = self.new_record()
+        self._changes = 0           # Rows emitted, so unchanged data is not republished
+
+        if kwargs.get("snapshot"):
+            try:
+                from .snapshot import Snapshot
+                self.snapshot = Snapshot.attach(kwargs["snapshot"], writer=True)
+            except Exception as e:
+                self.report_error(f"Error attaching display snapshot: {e}")
+
+        if kwargs.get("ring"):
+            try:
+                from .ring import SharedRing
+                self.ring = SharedRing.attach(kwargs["ring"], self.record_dtype())
+            except Exception as e:
+                self.report_error(f"Error attaching shared ring: {e}")
+
+        self.writer = None
+        if self.save_data:
+            self.save_path = next_path(self.save_path or ".", self.name,
+                                       self.save_extension)
+            self.writer = self.add_writer(self.save_path, self.columns())
+            self.save_data = self.writer is not None
+
+    @classmethod
+    def columns(cls):
+        """Header of the main CSV file"""
+        if cls.record_type is not None:
+            return list(cls.record_type.columns)
+        return list(cls.template)
+
+    def new_record(self):
+        """Empty row to fill in"""
+        if self.record_type is not None:
+            return self.record_type()
+        return self.template.copy()
+
+    @classmethod
+    def text_fields(cls):
+        """Columns stored as text in the shared ring and Arrow files"""
+        if cls.record_type is not None:
+            return cls.record_type.text_fields
+        return dt.text_fields
+
+    @classmethod
+    def record_dtype(cls):
+        """NumPy dtype of the rows in a shared ring"""
+        from .ring import record_dtype
+        return record_dtype(cls.columns(), cls.text_fields())
+
+    @property
+    def save_extension(self):
+        """Extension of the files written in ``save_format``"""
+        if self.compression and self.save_format == "csv":
+            from .compression import CODECS
+            return f"csv.{CODECS[self.compression]}"
+        return SAVE_FORMATS[self.save_format]
+
+    @property
+    def save_stem(self):
+        """``save_path`` without ``save_extension``, the base name of side files"""
+        suffix = "." + self.save_extension
+        if self.save_path.endswith(suffix):
+            return self.save_path[:-len(suffix)]
+        return self.save_path
+
+    def add_writer(self, path, columns, batch=None):
+        """Create a file writer that is started and stopped with the driver; None on error"""
+        try:
+            args = (path, columns, batch or self.write_batch, self.buffer_size,
+                    self.report_error, self.stage_policy("write"), self.spill_path)
+            if self.save_format == "csv":
+                writer = CsvWriter(*args, compression=self.compression,
+                                   **self.flush_policy)
+            else:
+                from .arrow import ArrowWriter
+                writer = ArrowWriter(*args, parquet=self.save_format == "parquet",
+                                     compression=self.compression,
+                                     text_fields=self.text_fields(), **self.flush_policy)
+        except Exception as e:
+            self.report_error(f"Error opening file for writing: {e}")
+            return None
+        self._writers.append(writer)
+        return writer
+
+    def stage_policy(self, stage):
+        if isinstance(self.buffer_policy, dict):
+            return self.buffer_policy.get(stage, BLOCK)
+        return self.buffer_policy
+
+    def buffer_stats(self):
+        """Counters of every stage buffer, by name"""
+        buffers = [self._rawbuffer] + [writer.buffer for writer in self._writers]
+        return {buffer.name: buffer.stats() for buffer in buffers}
+
+    def report_error(self, message):
+        print(message)
+        if self.error_queue is not None:
+            self.error_queue.put(message)
+
+    def start(self):
+        try:
+            self.open()
+
+            self._stop_event.clear()
+            self._stopped = False
+            self._stop_on_signals()
+
+            self._raw_data_thread = threading.Thread(target=self._read_loop)
+            self._raw_data_thread.start()
+
+            self._parse_thread = threading.Thread(target=self._parse_loop)
+            self._parse_thread.start()
+
+            for writer in self._writers:
+                writer.start()
+
+            display = self.snapshot is not None or self.queue is not None
+            published = 0
+            while not self._stop_event.is_set():
+                if display and self._changes != published:
+                    published = self._changes
+                    self._publish(self.publish())
+                self._stop_event.wait(self.display_timer)
+
+        except Exception as e:
+            self.report_error(f"Serial port error: {e}")
+        finally:
+            # Also on KeyboardInterrupt, so the threads end and the files are flushed
+            self.stop()
+
+    def stop(self):
+        if self._stopped:
+            return
+        self._stopped = True
+        self._stop_event.set()
+        self.interrupt()
+
+        if isinstance(self._raw_data_thread, threading.Thread) and self._raw_data_thread.is_alive():
+            self._raw_data_thread.join()
+
+        # Sentinels wake the consumers once everything queued before them is handled
+        if isinstance(self._parse_thread, threading.Thread) and self._parse_thread.is_alive():
+            self._rawbuffer.put(None)
+            self._parse_thread.join()
+
+        for writer in self._writers:
+            writer.close()
+            self._print_write_stats(writer)
+        self._rawbuffer.close()
+        self._report_buffer_losses()
+
+        self.close()
+
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+
+    def _print_write_stats(self, writer):
+        stats = writer.stats()
+        if stats["writes"]:
+            print(f"{os.path.basename(writer.path)}: {stats['rows']} rows, "
+                  f"{stats['bytes'] / 1e6:.1f} MB in {stats['writes']} writes "
+                  f"({stats['bytes_per_second'] / 1e3:.1f} kB/s), {stats['syncs']} fsyncs, "
+                  f"write latency {stats['mean_latency'] * 1e3:.1f} ms mean, "
+                  f"{stats['max_latency'] * 1e3:.1f} ms max"
+                  + (f", compressed {stats['bytes'] / stats['file_bytes']:.1f}x"
+                     if getattr(writer, "compression", None) and stats["file_bytes"] else ""))
+
+    def _report_buffer_losses(self):
+        for name, stats in self.buffer_stats().items():
+            if stats["dropped"] or stats["spilled"]:
+                self.report_error(
+                    f"Buffer {name}: dropped {stats['dropped']}, spilled {stats['spilled']}, "
+                    f"high water {stats['high_water']}/{stats['size']}")
+
+    def _stop_on_signals(self):
+        """Let Process.terminate() and Ctrl-C stop the loops and flush files instead of killing them.
+
+        SIGINT is left alone if the parent made this process ignore it.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        handler = lambda signum, frame: self._stop_event.set()
+        signal.signal(signal.SIGTERM, handler)
+        if signal.getsignal(signal.SIGINT) is not signal.SIG_IGN:
+            signal.signal(signal.SIGINT, handler)
+
+    def _read_loop(self):
+        delay = 0
+        while not self._stop_event.is_set():
+            try:
+                for item in self.read():
+                    self._rawbuffer.put(item)
+                delay = 0
+            except OSError as e:
+                # The port is gone (e.g. an unplugged USB serial adapter): stop, and
+                # let the supervisor restart the driver
+                if not self._stop_event.is_set():
+                    self.report_error(f"{self.kind.upper()} port error, stopping: {e}")
+                    self._stop_event.set()
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    self.report_error(f"{self.kind.upper()} Read Error: {e}")
+                    delay = min(2 * delay or 0.01, READ_BACKOFF)
+                    self._stop_event.wait(delay)
+
+    def _parse_loop(self):
+        while True:
+            item = self._rawbuffer.get()
+            if item is None:
+                break
+            try:
+                self.decode(item)
+            except Exception as e:
+                self.report_error(f"Parsing Error: {e!r}")
+        self.flush()
+
+    def emit(self, row):
+        """Hand a finished row to the display, the file writer and the ring.
+
+        The row is shared with the writer thread and must not be changed
+        afterwards.
+        """
+        self._last_data = row
+        self._changes += 1
+        if self.writer is not None:
+            self.writer.put(row)
+        if self.ring is not None:
+            self.ring.put(row)
+
+    def emit_batch(self, records):
+        """Hand a structured array of ``record_dtype()`` rows to the display,
+        the file writers and the ring, without a record object per row.
+
+        Only for subclasses with a ``record_type``. The array is shared with
+        the writer thread and must not be changed afterwards.
+        """
+        if not len(records):
+            return
+        self._last_data = self.record_type.from_array(records[-1])
+        self._changes += len(records)
+        if self.writer is not None:
+            self.writer.put(records)
+        if self.ring is not None:
+            self.ring.put_batch(records)
+
+    def publish(self):
+        """Row shown on the display"""
+        return self._last_data
+
+    def _publish(self, data):
+        data = format_row(data)
+        if self.snapshot is not None:
+            self.snapshot.write(data)
+        else:
+            self.queue.put(data)
+
+    def get_last_data(self):
+        """Return the last complete data packet"""
+        return self._last_data
+
+    def open(self):
+        raise NotImplementedError
+
+    def read(self):
+        raise NotImplementedError
+
+    def decode(self, item):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def interrupt(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __del__(self):
+        self.stop()
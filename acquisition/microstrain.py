@@ -0,0 +1,117 @@
+import mscl
+import datetime
+from . import datatypes as dt
+from .driver import SensorDriver
+from .records import MicrostrainSample
+
+
+class Microstrain(SensorDriver):
+    name = "microstrain_data"
+    template = {**dt.time_template, **dt.imu_template}
+    record_type = MicrostrainSample
+
+    def __init__(self, **kwargs):
+        self.imu_port = kwargs.get("imu_port", "/dev/ttyACM0")
+        self.baud_rate = kwargs.get("baud_rate", 115200)
+        self.connection = None
+        self.node = None
+        super().__init__(**kwargs)
+
+        self.start()
+
+    def open(self):
+        # Attempt to establish a connection to the Microstrain device
+        try:
+            self.connection = mscl.Connection.Serial(
+                self.imu_port, self.baud_rate)
+            self.node = mscl.InertialNode(self.connection)
+            print("Connected to Microstrain device.")
+
+            if not self.node.isDataStreamEnabled(mscl.MipTypes.CLASS_AHRS_IMU):
+                self.enable_data_streams()
+        except mscl.Error as e:
+            raise ConnectionError(
+                f"Error connecting to Microstrain device: {e}") from e
+
+    def close(self):
+        # Stop the data stream and close the connection
+        if isinstance(self.connection, mscl.Connection):
+            try:
+                self.connection.disconnect()
+                self.connection = None
+
+                print("Connection closed.")
+            except mscl.Error as e:
+                print(f"Error closing connection: {e}")
+
+    def enable_data_streams(self):
+        # Enable data streams based on the device's capabilities
+        if self.node.features().supportsCategory(mscl.MipTypes.CLASS_AHRS_IMU):
+            self.node.enableDataStream(mscl.MipTypes.CLASS_AHRS_IMU)
+
+        if self.node.features().supportsCategory(mscl.MipTypes.CLASS_ESTFILTER):
+            self.node.enableDataStream(mscl.MipTypes.CLASS_ESTFILTER)
+
+        if self.node.features().supportsCategory(mscl.MipTypes.CLASS_GNSS):
+            self.node.enableDataStream(mscl.MipTypes.CLASS_GNSS)
+
+    def read(self):
+        # Blocks for up to 500 ms waiting for packets
+        try:
+            packets = self.node.getDataPackets(500, 100)
+        except mscl.Error as e:
+            self.report_error(f"Error reading data: {e}")
+            self._stop_event.set()
+            return ()
+
+        raw_packets = []
+        for packet in packets:
+            """
+            timeInfo_tow_ahrsImu: 199.586000
+            scaledAccelX: 0.026692 scaledAccelY: 0.009321 scaledAccelZ: -0.999889
+            roll: -0.010865 pitch: 0.023428 yaw: -1.357981
+            orientQuaternion: [0.778182,0.00312887,0.012527,-0.627906]
+            scaledGyroX: -0.001219 scaledGyroY: 0.000571 scaledGyroZ: 0.000751
+            """
+            now = datetime.datetime.now()
+            raw_data = {"systemepoch": now.timestamp() * 1000,
+                        "systemtime": now.strftime("%Y-%m-%d %H:%M:%S.%f")}
+            for dataPoint in packet.data():
+                raw_data[dataPoint.channelName()] = dataPoint.as_string()
+            raw_packets.append(raw_data)
+        return raw_packets
+
+    def decode(self, raw_data):
+        # Direct field mappings
+        self._current_data.update({
+            "systemtime": raw_data.get("systemtime"),
+            "systemepoch": raw_data.get("systemepoch"),
+            "imutime": raw_data.get("timeInfo_tow_ahrsImu"),
+            "roll": raw_data.get("roll"),
+            "pitch": raw_data.get("pitch"),
+            "yaw": raw_data.get("yaw"),
+            "accX": raw_data.get("scaledAccelX"),
+            "accY": raw_data.get("scaledAccelY"),
+            "accZ": raw_data.get("scaledAccelZ"),
+            "gyroX": raw_data.get("scaledGyroX"),
+            "gyroY": raw_data.get("scaledGyroY"),
+            "gyroZ": raw_data.get("scaledGyroZ"),
+        })
+
+        quat = raw_data.get("orientQuaternion")
+        if isinstance(quat, str) and quat.startswith("[") and quat.endswith("]"):
+            try:
+                q_vals = [float(x.strip())
+                          for x in quat[1:-1].split(",")]
+                if len(q_vals) == 4:
+                    self._current_data["qX"], self._current_data[
+                        "qY"], self._current_data["qZ"], self._current_data["qW"] = q_vals
+            except ValueError:
+                print("Invalid quaternion format")
+
+        # Only complete samples are saved and displayed
+        if all(v is not None for v in self._current_data.values()):
+            self.emit(self._current_data)
+
+        self._current_data = self.new_record()
+
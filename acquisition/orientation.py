@@ -0,0 +1,36 @@
+"""Orientation maths shared by the sensor drivers.
+
+Angles are roll, pitch and yaw in radians using the aerospace Z-Y-X
+convention of the Microstrain and WitMotion outputs: yaw about Z, then pitch
+about the new Y, then roll about the new X (the same rotation as extrinsic
+x-y-z, scipy's ``from_euler('xyz', ...)``). Quaternions are scalar-last
+``(x, y, z, w)``.
+"""
+import math
+
+
+def euler_to_quaternion(roll, pitch, yaw):
+    """Quaternion (x, y, z, w) for a single attitude"""
+    cr, sr = math.cos(roll * 0.5), math.sin(roll * 0.5)
+    cp, sp = math.cos(pitch * 0.5), math.sin(pitch * 0.5)
+    cy, sy = math.cos(yaw * 0.5), math.sin(yaw * 0.5)
+    return (
+        sr * cp * cy - cr * sp * sy,
+        cr * sp * cy + sr * cp * sy,
+        cr * cp * sy - sr * sp * cy,
+        cr * cp * cy + sr * sp * sy,
+    )
+
+
+def euler_to_quaternion_array(roll, pitch, yaw):
+    """Vectorized euler_to_quaternion; returns an array of shape (..., 4)"""
+    import numpy as np  # Keeps the scalar path (Ublox) free of the NumPy import
+
+    half = np.stack(np.broadcast_arrays(roll, pitch, yaw)).astype(float) * 0.5
+    (cr, cp, cy), (sr, sp, sy) = np.cos(half), np.sin(half)
+    return np.stack((
+        sr * cp * cy - cr * sp * sy,
+        cr * sp * cy + sr * cp * sy,
+        cr * cp * sy - sr * sp * cy,
+        cr * cp * cy + sr * sp * sy,
+    ), axis=-1)
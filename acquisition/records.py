@@ -0,0 +1,153 @@
+"""Typed sample records built from the datatypes.py templates.
+
+A record class has a fixed set of columns, in template order, and keeps
+its values in one slotted object (a single list, no per-sample dict). It
+reads and writes like the row dicts it replaces (``record["2D hAcc"]``,
+``get``, ``update``, ``keys``, ``values``, ``items``, ``**record``), so it
+goes anywhere a row went: ``SensorDriver.emit``, the CSV and Arrow
+writers, the shared ring and the display. Columns that are identifiers
+are also attributes (``sample.accX``).
+
+``dtype()`` is the matching NumPy record layout (the one the shared ring
+uses); ``to_array`` packs records into a structured array and
+``from_array`` turns an element of one back into a record.
+
+Both conversions copy the values: a record holds Python values (None for
+a missing value, str for text) that a NumPy row cannot. Drivers that
+decode whole batches skip records altogether and hand a structured array
+of ``dtype()`` rows to ``SensorDriver.emit_batch``; the writers, the ring
+and RingReader's views use it as is, and only the row shown on the
+display becomes a record.
+"""
+from operator import itemgetter
+
+from . import datatypes as dt
+
+
+class Record():
+    """Fixed-column sample; subclasses are made with ``record_type``"""
+    __slots__ = ("_values",)
+    columns = ()
+    defaults = ()       # Template values, in column order
+    text_fields = dt.text_fields    # Columns stored as text in binary layouts
+    _index = {}
+
+    def __init__(self, values=None):
+        self._values = list(self.defaults)
+        if values is not None:
+            self.update(values)
+
+    @classmethod
+    def dtype(cls):
+        from .ring import record_dtype
+        return record_dtype(cls.columns, cls.text_fields)
+
+    @classmethod
+    def to_array(cls, records):
+        """Structured array of ``dtype()`` holding a copy of ``records``"""
+        import numpy as np
+        return np.array([record.as_tuple() for record in records], cls.dtype())
+
+    @classmethod
+    def from_array(cls, row):
+        """Record copied from an element of a ``dtype()`` array (NaN and b"" become None)"""
+        record = cls()
+        values = record._values = [None] * len(cls.columns)
+        for i, value in enumerate(row.tolist()):
+            if isinstance(value, bytes):
+                values[i] = value.decode() or None
+            elif value == value:    # Not NaN
+                values[i] = value
+        return record
+
+    def as_tuple(self):
+        """Values converted for a ``dtype()`` array: bytes for text, floats otherwise"""
+        from .driver import format_value, number_value
+        return tuple(format_value(value).encode() if column in self.text_fields
+                     else number_value(value)
+                     for column, value in zip(self.columns, self._values))
+
+    def keys(self):
+        return self.columns
+
+    def values(self):
+        return self._values
+
+    def items(self):
+        return zip(self.columns, self._values)
+
+    def get(self, column, default=None):
+        i = self._index.get(column)
+        return default if i is None else self._values[i]
+
+    def update(self, values=(), **kwargs):
+        index, own = self._index, self._values
+        if hasattr(values, "items"):
+            values = values.items()
+        for column, value in values:
+            own[index[column]] = value
+        for column, value in kwargs.items():
+            own[index[column]] = value
+
+    def copy(self):
+        record = object.__new__(type(self))
+        record._values = self._values.copy()
+        return record
+
+    def __getitem__(self, column):
+        return self._values[self._index[column]]
+
+    def __setitem__(self, column, value):
+        self._values[self._index[column]] = value
+
+    def __contains__(self, column):
+        return column in self._index
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other._values == self._values
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+
+def _setter(i):
+    def set_value(self, value):
+        self._values[i] = value
+    return set_value
+
+
+def record_type(name, *templates, text_fields=dt.text_fields):
+    """Record class with the columns and default values of ``templates``, merged in order"""
+    merged = {column: value for template in templates for column, value in template.items()}
+    columns = tuple(merged)
+    namespace = {
+        "__slots__": (),
+        "__module__": __name__,
+        "columns": columns,
+        "defaults": tuple(merged.values()),
+        "text_fields": frozenset(text_fields),
+        "_index": {column: i for i, column in enumerate(columns)},
+    }
+    for i, column in enumerate(columns):
+        if column.isidentifier() and not hasattr(Record, column):
+            namespace[column] = property(
+                lambda self, get=itemgetter(i): get(self._values), _setter(i))
+    return type(name, (Record,), namespace)
+
+
+GnssEpoch = record_type("GnssEpoch", dt.time_template, dt.gps_template,
+                        dt.status_template, dt.calib_status_template)
+ImuSample = record_type("ImuSample", dt.time_template, dt.imu_template)
+WitMotionSample = record_type("WitMotionSample", dt.time_template, dt.imu_template,
+                              dt.witmotion_template, text_fields=dt.device_time_text_fields)
+MicrostrainSample = record_type("MicrostrainSample", dt.time_template, dt.imu_template,
+                                text_fields=dt.device_time_text_fields)
+EsfSample = record_type("EsfSample", dt.time_template, dt.esf_template)
+Status = record_type("Status", dt.status_template)
+CalibStatus = record_type("CalibStatus", dt.calib_status_template)
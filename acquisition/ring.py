@@ -0,0 +1,179 @@
+"""Shared-memory ring of fixed-size sensor records.
+
+One producer (the driver process) appends records; any number of
+consumers map the same block by name and read batches as NumPy views,
+without locks and without copying. The block holds a small header, one
+sequence number per slot and the records::
+
+    | head | capacity | itemsize | ... | seq[capacity] | records[capacity] |
+
+``head`` counts the records ever written; record ``n`` lives in slot
+``n % capacity``. The producer marks the slot (or the slots of a batch)
+as being written (``WRITING``), writes the records, sets the slot
+sequence numbers and then publishes ``head``. The slot after ``head`` may be half written,
+so a reader sees at most ``capacity - 1`` records; one that falls further
+behind has been overrun and skips ahead, counting what it lost. A reader
+that copied a batch checks the sequence numbers of its slots afterwards:
+any that changed were overwritten while it was reading.
+"""
+import numpy as np
+
+from multiprocessing import shared_memory
+from . import datatypes as dt
+from .snapshot import attach_shared_memory
+from .driver import format_value, number_value
+
+
+RING_CAPACITY = 4096    # records, about 20 s of a 200 Hz IMU
+TEXT_SIZE = 32          # bytes per text field
+HEADER = np.dtype([("head", "<u8"), ("capacity", "<u8"), ("itemsize", "<u8")])
+HEADER_SIZE = 64        # keeps the slot arrays aligned
+WRITING = np.iinfo(np.uint64).max   # sequence number of a slot being overwritten
+
+
+def record_dtype(columns, text_fields=dt.text_fields):
+    """Record layout for CSV columns: float64, or bytes for ``text_fields``"""
+    return np.dtype([(name, f"S{TEXT_SIZE}" if name in text_fields else "<f8")
+                     for name in columns])
+
+
+class SharedRing():
+    """Single-producer ring buffer in ``multiprocessing.shared_memory``.
+
+    Create it with ``SharedRing.create`` in the process that owns its
+    lifetime and pass ``name`` to the others, which ``attach``. Only one
+    process may write.
+    """
+
+    def __init__(self, shm, dtype, owner):
+        self.dtype = np.dtype(dtype)
+        self._shm = shm
+        self._owner = owner
+        self._header = np.ndarray((), HEADER, shm.buf)
+        capacity = int(self._header["capacity"])
+        if int(self._header["itemsize"]) != self.dtype.itemsize:
+            raise ValueError(
+                f"Ring {shm.name} holds {int(self._header['itemsize'])} byte records, "
+                f"not {self.dtype.itemsize}")
+        self.capacity = capacity
+        self.seqs = np.ndarray((capacity,), "<u8", shm.buf, HEADER_SIZE)
+        self.records = np.ndarray((capacity,), self.dtype, shm.buf,
+                                  HEADER_SIZE + 8 * capacity)
+        self._text = [name for name in self.dtype.names
+                      if self.dtype[name].kind == "S"]
+
+    @classmethod
+    def create(cls, dtype, capacity=RING_CAPACITY):
+        dtype = np.dtype(dtype)
+        shm = shared_memory.SharedMemory(
+            create=True, size=HEADER_SIZE + (8 + dtype.itemsize) * capacity)
+        header = np.ndarray((), HEADER, shm.buf)
+        header["head"] = 0
+        header["capacity"] = capacity
+        header["itemsize"] = dtype.itemsize
+        del header
+        return cls(shm, dtype, owner=True)
+
+    @classmethod
+    def attach(cls, name, dtype):
+        return cls(attach_shared_memory(name), dtype, owner=False)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def head(self):
+        """Number of records written so far"""
+        return int(self._header["head"])
+
+    def put(self, row):
+        """Append one row (dict of CSV strings) as a record"""
+        record = tuple(
+            format_value(row.get(name)).encode()[:TEXT_SIZE] if name in self._text
+            else number_value(row.get(name))
+            for name in self.dtype.names)
+        head = int(self._header["head"])
+        slot = head % self.capacity
+        self.seqs[slot] = WRITING
+        self.records[slot] = record
+        self.seqs[slot] = head
+        self._header["head"] = head + 1
+
+    def put_batch(self, records):
+        """Append a structured array of records with this ring's dtype"""
+        head = int(self._header["head"])
+        total = len(records)
+        records = records[-(self.capacity - 1):]    # Older ones would be overwritten anyway
+        seqs = np.arange(head + total - len(records), head + total, dtype=np.uint64)
+        slots = seqs % self.capacity
+        self.seqs[slots] = WRITING
+        self.records[slots] = records
+        self.seqs[slots] = seqs
+        self._header["head"] = head + total
+
+    def reader(self, latest=True):
+        """A reader starting at the newest record, or at the oldest still held"""
+        return RingReader(self, self.head if latest else max(0, self.head - self.capacity + 1))
+
+    def close(self):
+        """Unmap the ring; the creator also frees the memory"""
+        self._header = self.seqs = self.records = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+            self._owner = False
+
+
+class RingReader():
+    """Cursor into a SharedRing, returning new records as zero-copy views.
+
+    A view stays valid until the producer wraps around onto it; ``valid``
+    compares the slot sequence numbers of the last batch with the ones
+    read, so it tells whether the batch was still intact after it was
+    used. Callers that keep records should copy them first.
+    """
+
+    def __init__(self, ring, cursor=0):
+        self.ring = ring
+        self.cursor = cursor
+        self.lost = 0
+        self._batch_start = cursor
+
+    def read(self, max_records=None):
+        """Records written since the last call (contiguous up to the end of the ring)"""
+        ring = self.ring
+        head = ring.head
+        oldest = head - ring.capacity + 1
+        if self.cursor < oldest:
+            self.lost += oldest - self.cursor
+            self.cursor = oldest
+
+        slot = self.cursor % ring.capacity
+        count = min(head - self.cursor, ring.capacity - slot)
+        if max_records is not None:
+            count = min(count, max_records)
+        self._batch_start = self.cursor
+        self.cursor += count
+        return ring.records[slot:slot + count]
+
+    def read_all(self):
+        """Copy of every record written since the last call, in order"""
+        batches = []
+        while True:
+            batch = self.read()
+            if len(batch) == 0:
+                break
+            batch = batch.copy()
+            if self.valid():
+                batches.append(batch)
+            else:
+                self.lost += len(batch)     # Overwritten while copying
+        return np.concatenate(batches) if batches else self.ring.records[:0].copy()
+
+    def valid(self):
+        """True if no record of the last batch has been overwritten since it was read"""
+        ring = self.ring
+        slot = self._batch_start % ring.capacity
+        expected = np.arange(self._batch_start, self.cursor, dtype=np.uint64)
+        return bool(np.array_equal(ring.seqs[slot:slot + len(expected)], expected))
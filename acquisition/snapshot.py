@@ -0,0 +1,121 @@
+"""Latest-value display channel in shared memory.
+
+A ``Snapshot`` holds one row (a dict, stored as JSON) that the producer
+overwrites and consumers read whenever they render. It is guarded by a
+seqlock: the writer makes the sequence number odd, writes, and makes it
+even again; a reader retries until it sees the same even number before
+and after copying. ``sequence // 2`` counts the writes, so a consumer
+only redraws when it changed, and a stalled consumer simply skips to the
+newest row instead of leaving a backlog.
+
+A writer killed mid-write leaves the sequence odd. Readers give up after
+``READ_TIMEOUT`` seconds and keep the row they had, and the next writer
+to attach (a restarted driver) makes the sequence even again.
+"""
+import json
+import struct
+import time
+
+from multiprocessing import shared_memory
+
+
+SNAPSHOT_SIZE = 8192    # bytes of JSON a slot can hold
+SEQUENCE = struct.Struct("<Q")
+LENGTH = struct.Struct("<I")    # payload bytes, after the sequence number
+HEADER_SIZE = 16
+READ_TIMEOUT = 0.01     # s a reader waits for a write in progress
+
+
+def attach_shared_memory(name):
+    """Map an existing block without taking ownership of it"""
+    try:
+        # Only the creator unlinks (Python 3.13+; child processes share
+        # the creator's resource tracker either way)
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class Snapshot():
+    """Seqlock-protected slot holding the latest row of one sensor"""
+
+    def __init__(self, shm, owner):
+        self._shm = shm
+        self._owner = owner
+        self.size = shm.size - HEADER_SIZE
+
+    @classmethod
+    def create(cls, size=SNAPSHOT_SIZE):
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + size)
+        SEQUENCE.pack_into(shm.buf, 0, 0)
+        LENGTH.pack_into(shm.buf, SEQUENCE.size, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name, writer=False):
+        """Map the slot created by ``create``; ``writer`` repairs a write left unfinished"""
+        snapshot = cls(attach_shared_memory(name), owner=False)
+        if writer:
+            buf = snapshot._shm.buf
+            sequence = SEQUENCE.unpack_from(buf)[0]
+            if sequence & 1:
+                # The previous writer died mid-write: empty the slot and make it even
+                LENGTH.pack_into(buf, SEQUENCE.size, 0)
+                SEQUENCE.pack_into(buf, 0, sequence + 1)
+        return snapshot
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def version(self):
+        """Number of completed writes"""
+        return SEQUENCE.unpack_from(self._shm.buf)[0] // 2
+
+    def write(self, data):
+        """Replace the slot with ``data`` (single writer only)"""
+        payload = json.dumps(data).encode()
+        if len(payload) > self.size:
+            raise ValueError(f"Snapshot of {len(payload)} bytes exceeds {self.size}")
+        buf = self._shm.buf
+        sequence = SEQUENCE.unpack_from(buf)[0]
+        SEQUENCE.pack_into(buf, 0, sequence + 1)   # Odd: write in progress
+        buf[HEADER_SIZE:HEADER_SIZE + len(payload)] = payload
+        LENGTH.pack_into(buf, SEQUENCE.size, len(payload))
+        SEQUENCE.pack_into(buf, 0, sequence + 2)
+
+    def read(self, timeout=READ_TIMEOUT):
+        """(version, data) of the latest write; data is None before the first.
+
+        Returns (None, None) if a write is still in progress after
+        ``timeout`` seconds, which means the writer died during it.
+        """
+        buf = self._shm.buf
+        deadline = time.monotonic() + timeout
+        while True:
+            sequence = SEQUENCE.unpack_from(buf)[0]
+            if not sequence & 1:
+                length = LENGTH.unpack_from(buf, SEQUENCE.size)[0]
+                payload = bytes(buf[HEADER_SIZE:HEADER_SIZE + length])
+                if SEQUENCE.unpack_from(buf)[0] == sequence:
+                    return sequence // 2, json.loads(payload) if length else None
+            if time.monotonic() >= deadline:
+                return None, None
+            time.sleep(0)   # Writer is mid-update
+
+    def read_if_changed(self, version):
+        """(version, data) if there was a write after ``version``, else (version, None)"""
+        if self.version == version:
+            return version, None
+        new_version, data = self.read()
+        if new_version is None:
+            return version, None    # Stale: the caller keeps its last row
+        return new_version, data
+
+    def close(self):
+        """Unmap the slot; the creator also frees the memory"""
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+            self._owner = False
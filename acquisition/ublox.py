@@ -0,0 +1,825 @@
+import os
+import json
+import time
+import math
+import hashlib
+import calendar
+import serial
+import struct
+import threading
+from . import datatypes as dt
+from .driver import SensorDriver, format_value
+from .records import GnssEpoch, ImuSample, EsfSample, Status, CalibStatus
+from .orientation import euler_to_quaternion
+from .ublox_profiles import PROFILES, profile_config
+
+from pyubx2 import (
+    UBXReader, UBXMessage, UBX_MSGIDS, calc_checksum, POLL, POLL_LAYER_RAM, SET_LAYER_RAM,
+    SET_LAYER_BBR, SET_LAYER_FLASH, TXN_NONE, TXN_START, TXN_ONGOING, TXN_COMMIT
+)
+from queue import Queue, Empty
+from datetime import datetime
+
+GPS_EPOCH = datetime(1980, 1, 6)
+GPS_UTC_OFFSET = 18
+DEG_TO_RAD = math.pi / 180
+FIX_FLAGS = {
+    "0": "No Fix",
+    "1": "2D/3D GNSS fix",
+    "2": "Differential GNSS fix",
+    "4": "RTK Fixed",
+    "5": "RTK Float",
+    "6": "GNSS Dead Reckoning",
+}
+GNSS_FIX_FLAGS = {
+    0: "No Fix",
+    1: "Dead Reckoning",
+    2: "2D GNSS fix",
+    3: "3D GNSS fix",
+    4: "GNSS + Dead Reckoning",
+    5: "Time only",
+}
+UBX_MSG_IDS = {identity: int.from_bytes(msg_id, "big")
+               for msg_id, identity in UBX_MSGIDS.items()}
+NMEA_TALKERS = ("GN", "GP", "GL", "GA", "GB", "GQ")
+# Proprietary sentences, keyed by identity, with the address field the reader sees
+NMEA_PROPRIETARY = {"PSSNHRP": "PSSN"}
+SECONDS_PER_DAY = 86400
+SECONDS_PER_WEEK = 7 * SECONDS_PER_DAY
+GRAVITY = 9.80665      # m/s^2 per g
+RAW_BUFFER_SIZE = 1 << 20   # bytes held in memory before the raw log hits disk
+RAW_INDEX_INTERVAL = 1.0    # s between arrival-time index entries
+RAWX_MAX_RATE = 10          # Hz, highest RXM-RAWX rate we ask the receiver for
+CONFIG_TIMEOUT = 1.0        # s to wait for a reply to a configuration message
+CONFIG_BATCH = 64           # CFG-VALSET/VALGET key limit per message
+# Replies read while configuring: ACK-NAK, ACK-ACK, CFG-VALGET, SEC-UNIQID
+CONFIG_REPLIES = (0x0500, 0x0501, 0x068B, 0x2703)
+PROFILE_CACHE = os.path.join(os.path.expanduser("~"), ".ublox_profiles.json")
+
+# ESF-MEAS/ESF-RAW are decoded from the raw frame rather than by UBXReader
+ESF_MEAS_ID = b"\x10\x02"
+ESF_RAW_ID = b"\x10\x03"
+ESF_MEAS_HEADER = struct.Struct("<IHH")     # timeTag, flags, id
+ESF_MEAS_WORD = struct.Struct("<I")         # dataField (24 bit) | dataType << 24
+ESF_RAW_SAMPLE = struct.Struct("<II")       # data word, sTtag
+# ESF data type -> (esf_template field, scale to SI units)
+ESF_DATA_TYPES = {
+    5: ("gyroZ", 2 ** -12 * DEG_TO_RAD),    # rad/s
+    6: ("wheelTicksFL", 1),
+    7: ("wheelTicksFR", 1),
+    8: ("wheelTicksRL", 1),
+    9: ("wheelTicksRR", 1),
+    10: ("speedTicks", 1),
+    11: ("wheelSpeed", 1e-3),               # m/s
+    12: ("gyroTemp", 1e-2),                 # deg C
+    13: ("gyroY", 2 ** -12 * DEG_TO_RAD),
+    14: ("gyroX", 2 ** -12 * DEG_TO_RAD),
+    16: ("accX", 2 ** -10),                 # m/s^2
+    17: ("accY", 2 ** -10),
+    18: ("accZ", 2 ** -10),
+}
+# Tick counters carry a direction bit (bit 23) instead of a two's complement sign
+ESF_TICK_TYPES = frozenset((6, 7, 8, 9, 10))
+
+
+def iso_utc(epoch):
+    """Format a Unix epoch as the ISO 8601 UTC string written to the CSV"""
+    seconds, micros = divmod(round(epoch * 1e6), 1000000)
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + \
+        f".{micros:06d}Z"
+
+
+def pvt_fix_quality(pvt):
+    """Map a NAV-PVT solution onto the GGA quality codes of FIX_FLAGS"""
+    if pvt.fixType == 1:
+        return 6
+    if pvt.fixType not in (2, 3, 4) or not pvt.gnssFixOk:
+        return 0
+    if pvt.carrSoln == 2:
+        return 4
+    if pvt.carrSoln == 1:
+        return 5
+    return 2 if pvt.diffSoln else 1
+
+
+def esf_value(word):
+    """(field, value) of an ESF data word, or None for types we do not log"""
+    data_type = (word >> 24) & 0x3F
+    if data_type not in ESF_DATA_TYPES:
+        return None
+    field, scale = ESF_DATA_TYPES[data_type]
+    value = word & 0xFFFFFF
+    if data_type in ESF_TICK_TYPES:
+        count = value & 0x7FFFFF
+        return field, -count if value & 0x800000 else count   # negative in reverse
+    if value & 0x800000:
+        value -= 0x1000000      # sign-extend the 24-bit field
+    return field, value * scale
+
+
+class RawStreamTee():
+    """Serial stream wrapper that copies every byte read into a raw log.
+
+    The receiver stream goes to ``path`` unchanged through a large write
+    buffer, so the file can be post-processed (PPK, RINEX conversion) with
+    standard tools. At most once per ``index_interval`` a
+    ``systemepoch,offset`` line is appended to ``index_path`` to align byte
+    offsets with arrival time.
+    """
+
+    def __init__(self, stream, path, index_path,
+                 buffer_size=RAW_BUFFER_SIZE, index_interval=RAW_INDEX_INTERVAL):
+        self._stream = stream
+        self._file = open(path, "wb", buffering=buffer_size)
+        self._index = open(index_path, "w")
+        self._index.write("systemepoch,offset\n")
+        self._index_interval = index_interval
+        self._next_index = 0.0
+        self.offset = 0
+
+    def read(self, size=1):
+        data = self._stream.read(size)
+        if data:
+            self._record(data)
+        return data
+
+    def readline(self):
+        data = self._stream.readline()
+        if data:
+            self._record(data)
+        return data
+
+    def _record(self, data):
+        now = time.time()
+        if now >= self._next_index:
+            self._index.write(f"{now:.3f},{self.offset}\n")
+            self._next_index = now + self._index_interval
+        self._file.write(data)
+        self.offset += len(data)
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class Ublox(SensorDriver):
+    kind = "gps"
+    template = {**dt.time_template, **dt.gps_template}
+    record_type = GnssEpoch
+    # Fusion attitude and inertial data are a stream of their own, one
+    # row per navigation solution at the priority output rate
+    imu_template = {**dt.time_template, **dt.imu_template}
+    # Sensor measurements go to their own file at the rate they arrive
+    esf_template = {**dt.time_template, **dt.esf_template}
+
+    def __init__(self, **kwargs):
+        self._serial = None
+        self.gps_port = kwargs.get("gps_port", "/dev/ttyACM0")
+        self.baud_rate = kwargs.get("baud_rate", 9600)
+        self.fusion = kwargs.get("fusion", False)
+        self.save_raw = kwargs.get("save_raw", kwargs.get("save_data", False))
+        self.raw_observables = kwargs.get("raw_observables", None)  # RAWX rate in Hz
+        self.receiver_port = kwargs.get("receiver_port", "USB")  # Receiver port we are on
+        self.profile = kwargs.get("profile", "fusion" if self.fusion else "pro")
+        self.profile_cache = kwargs.get("profile_cache", PROFILE_CACHE)
+        self.ntrip_details = kwargs.get("ntrip_details", {"start": False})
+        self.name = "ublox_data_fusion" if self.fusion else "ublox_data_pro"
+
+        self._status = Status()
+        self._calib_status = CalibStatus()
+        super().__init__(**kwargs)
+
+        self._current_imu = ImuSample()
+        self._last_imu = ImuSample()
+        self._last_esf = EsfSample()
+
+        self._ntripbuffer = Queue()
+        self._ntrip_thread = None
+        self._ntrip_client = None
+        self._raw_log = None
+        self._stream = None
+        self._bad_checksums = 0     # Raw frames dropped for a wrong checksum
+        self._epoch_itow = None     # iTOW of the record being assembled
+        self._pvt_seen = False      # NAV-PVT supersedes GGA once it arrives
+        self._pvt_day = None
+        self._pvt_day_epoch = 0
+        self._imu_itow = None       # iTOW of the inertial row being assembled
+        self._imu_epoch = None      # host time its first message was decoded
+        self._week_epoch = None     # UTC epoch of iTOW 0, taken from NAV-PVT
+        self._week_tow = 0
+        self._build_dispatch()
+
+        self._esf_writer = None
+        self._imu_writer = None
+        if self.save_data and self.fusion:
+            base_path = self.save_stem
+            self._esf_writer = self.add_writer(
+                f"{base_path}_esf.{self.save_extension}", list(self.esf_template))
+            self._imu_writer = self.add_writer(
+                f"{base_path}_imu.{self.save_extension}", list(self.imu_template))
+
+        self.start()
+
+    def open(self):
+        self._serial = serial.Serial(
+            self.gps_port, self.baud_rate, timeout=1)
+        stream = self._serial
+        if self.save_data and self.save_raw:
+            base_path = self.save_stem
+            self._raw_log = RawStreamTee(
+                self._serial, f"{base_path}.ubx", f"{base_path}_ubx_index.csv")
+            stream = self._raw_log
+        self._stream = stream
+        self._sbf_reader = None
+        self._ubr = UBXReader(stream, protfilter=3,
+                              msgfilter=self._msgfilter,
+                              errorhandler=self._raise_parse_error)
+
+        meas_rate = None
+        if self.profile:
+            profile = PROFILES[self.profile] if isinstance(
+                self.profile, str) else self.profile
+            meas_rate = profile["nav_rate"]     # CFG-RATE-MEAS, which RAWX follows
+            try:
+                self.apply_profile(profile)
+            except Exception as e:
+                self.report_error(f"Receiver configuration error: {e}")
+        if self.raw_observables:
+            self.enable_raw_observables(self.raw_observables, meas_rate)
+
+    def publish(self):
+        temp = {**self._last_data, **self._status, **self._calib_status}
+        if self.fusion:
+            temp.update({k: self._last_imu[k] for k in dt.imu_template})
+        temp['fix'] = FIX_FLAGS.get(format_value(temp['fix']), "Unknown")
+        return {k: str(v) if isinstance(v, (int, float)) else v
+                for k, v in temp.items()}
+
+    def apply_profile(self, profile):
+        """Bring the receiver in line with a configuration profile.
+
+        The receiver is always polled with CFG-VALGET. Keys whose value
+        differs are written with one CFG-VALSET transaction to RAM, BBR and
+        flash and read back. Keys that already matched may only be set in
+        RAM (by u-center, say), so they are saved to BBR and flash too,
+        unless the profile cache (a digest per receiver, by SEC-UNIQID)
+        shows the profile already saved to this receiver.
+        """
+        config = profile_config(profile, self.receiver_port)
+        digest = hashlib.sha1(json.dumps(
+            config, sort_keys=True).encode()).hexdigest()
+        reader = UBXReader(self._stream, protfilter=2,
+                           msgfilter=CONFIG_REPLIES)
+
+        unique_id = self._config_request(
+            reader, UBXMessage("SEC", "SEC-UNIQID", POLL), "SEC-UNIQID")
+        receiver = f"{unique_id.uniqueId:010x}" if unique_id else self.gps_port
+        cache = self._load_profile_cache()
+
+        baud_rate = config.pop("CFG_UART1_BAUDRATE", None)
+        changes = self._config_diff(reader, config)
+        if changes:
+            self._config_set(reader, changes)
+            mismatched = self._config_diff(reader, changes)
+            if mismatched:
+                raise ValueError(
+                    f"Receiver did not accept {', '.join(mismatched)}")
+        unsaved = {key: value for key, value in config.items() if key not in changes}
+        if unsaved and cache.get(receiver) != digest:
+            self._config_set(reader, unsaved, SET_LAYER_BBR | SET_LAYER_FLASH)
+
+        if baud_rate and self._config_diff(reader, {"CFG_UART1_BAUDRATE": baud_rate}):
+            # The receiver switches as soon as it applies this, so don't wait for the ACK
+            self._serial.write(UBXMessage.config_set(
+                SET_LAYER_RAM | SET_LAYER_BBR | SET_LAYER_FLASH, TXN_NONE,
+                [("CFG_UART1_BAUDRATE", baud_rate)]).serialize())
+            self._serial.flush()
+            if self.receiver_port == "UART1":
+                time.sleep(CONFIG_TIMEOUT / 10)
+                self._serial.baudrate = self.baud_rate = baud_rate
+
+        if cache.get(receiver) == digest:
+            return
+        cache[receiver] = digest
+        try:
+            with open(self.profile_cache, "w") as f:
+                json.dump(cache, f, indent=2)
+        except OSError as e:
+            print(f"Error writing profile cache: {e}")
+
+    def _load_profile_cache(self):
+        try:
+            with open(self.profile_cache) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _config_request(self, reader, message, identity):
+        """Send a message and return the reply with ``identity``, or None if NAKed"""
+        self._serial.write(message.serialize())
+        deadline = time.monotonic() + CONFIG_TIMEOUT
+        while time.monotonic() < deadline:
+            _, parsed_data = reader.read()
+            if parsed_data is None:
+                continue
+            if parsed_data.identity == identity:
+                return parsed_data
+            if parsed_data.identity == "ACK-NAK":
+                return None
+        raise TimeoutError(f"No {identity} reply from the receiver")
+
+    def _config_diff(self, reader, config):
+        """The items of ``config`` whose current (RAM) value differs"""
+        keys = list(config)
+        changes = {}
+        for start in range(0, len(keys), CONFIG_BATCH):
+            batch = keys[start:start + CONFIG_BATCH]
+            reply = self._config_request(reader, UBXMessage.config_poll(
+                POLL_LAYER_RAM, 0, batch), "CFG-VALGET")
+            if reply is None:
+                raise ValueError(f"Receiver rejected a poll of {', '.join(batch)}")
+            changes.update({key: config[key] for key in batch
+                            if getattr(reply, key, None) != config[key]})
+        return changes
+
+    def _config_set(self, reader, changes,
+                    layers=SET_LAYER_RAM | SET_LAYER_BBR | SET_LAYER_FLASH):
+        items = list(changes.items())
+        batches = [items[i:i + CONFIG_BATCH]
+                   for i in range(0, len(items), CONFIG_BATCH)]
+        for i, batch in enumerate(batches):
+            if len(batches) == 1:
+                transaction = TXN_NONE
+            elif i == 0:
+                transaction = TXN_START
+            elif i == len(batches) - 1:
+                transaction = TXN_COMMIT
+            else:
+                transaction = TXN_ONGOING
+            ack = self._config_request(reader, UBXMessage.config_set(
+                layers, transaction, batch), "ACK-ACK")
+            if ack is None:
+                raise ValueError(
+                    f"Receiver rejected {', '.join(key for key, _ in batch)}")
+
+    def enable_raw_observables(self, rate=RAWX_MAX_RATE, meas_rate=None):
+        """Turn on RXM-RAWX/SFRBX output (RAM layer) for PPK and RINEX export.
+
+        Without ``meas_rate`` the measurement rate is set to ``rate``;
+        otherwise RAWX, which comes once per measurement, is decimated from
+        the given measurement rate (not the priority navigation rate).
+        """
+        if not 0 < rate <= RAWX_MAX_RATE:
+            raise ValueError(
+                f"Raw observable rate must be in (0, {RAWX_MAX_RATE}] Hz, got {rate}")
+
+        config = []
+        if meas_rate is None:
+            config.append(("CFG_RATE_MEAS", round(1000 / rate)))    # ms
+            divider = 1
+        else:
+            if rate > meas_rate:
+                self.report_error(
+                    f"Raw observables at {rate} Hz requested, but the profile measures "
+                    f"at {meas_rate} Hz: RAWX will come at {meas_rate} Hz")
+            divider = max(1, round(meas_rate / rate))
+        config += [
+            (f"CFG_MSGOUT_UBX_RXM_RAWX_{self.receiver_port}", divider),
+            (f"CFG_MSGOUT_UBX_RXM_SFRBX_{self.receiver_port}", 1),
+        ]
+        self._serial.write(UBXMessage.config_set(
+            SET_LAYER_RAM, TXN_NONE, config).serialize())
+
+        if not (self.save_data and self.save_raw):
+            print("Raw observables enabled but the raw .ubx log is not being saved")
+
+    def _start_ntrip_thread(self):
+        from pygnssutils import GNSSNTRIPClient     # Only needed with NTRIP corrections
+
+        self._ntrip_client = GNSSNTRIPClient(app=self)
+        self._ntrip_client.run(
+            server=self.ntrip_details.get('server'),
+            port=self.ntrip_details.get('port'),
+            mountpoint=self.ntrip_details.get('mountpoint'),
+            datatype=self.ntrip_details.get('datatype'),
+            ntripuser=self.ntrip_details.get('ntripuser'),
+            ntrippassword=self.ntrip_details.get('ntrippassword'),
+            version=self.ntrip_details.get('version'),
+            ggainterval=self.ntrip_details.get('ggainterval'),
+            ggamode=0,
+            output=self._ntripbuffer,
+        )
+
+        self._ntrip_thread = threading.Thread(target=self._read_ntrip)
+        self._ntrip_thread.start()
+
+    def interrupt(self):
+        if self._serial and self._serial.is_open:
+            self._serial.cancel_read()  # Wake the blocking read
+
+        if self.ntrip_details['start']:
+            self._stop_ntrip()
+
+    def close(self):
+        if self._raw_log:
+            self._raw_log.close()
+            self._raw_log = None
+
+        if self._serial and self._serial.is_open:
+            self._serial.close()
+
+    def _stop_ntrip(self):
+        self.ntrip_details['start'] = False
+
+        if self._ntrip_client is not None and self._ntrip_client._connected:
+            self._ntrip_client.stop()
+            self._ntrip_client = None
+
+        if isinstance(self._ntrip_thread, threading.Thread) and self._ntrip_thread.is_alive():
+            self._ntrip_thread.join()
+            self._ntrip_thread = None
+
+    def read(self):
+        # Blocks until a message arrives or the port read times out
+        try:
+            raw_data, parsed_data = self._ubr.read()
+            if parsed_data is None and raw_data and raw_data[2:4] in self._raw_frames:
+                # UBXReader does not check filtered frames, so check them here
+                if calc_checksum(raw_data[2:-2]) == raw_data[-2:]:
+                    parsed_data = raw_data     # Decoded by its handler
+                else:
+                    self._bad_checksums += 1
+                    self.report_error(
+                        f"GPS checksum error: dropped {UBX_MSGIDS.get(raw_data[2:4])} frame "
+                        f"({self._bad_checksums} total)")
+        except OSError:
+            raise   # The port itself failed, SBF will not do better
+        except:
+            # If UBXReader fails, try reading SBF data
+            parsed_data = None
+            try:
+                _, parsed_data = self._sbf().read()
+            except OSError:
+                raise
+            except Exception as e:
+                print(f"SBF Read Error: {e}")
+                parsed_data = None
+        return () if parsed_data is None else (parsed_data,)
+
+    def _raise_parse_error(self, err):
+        raise err   # read() falls back to SBF
+
+    def _sbf(self):
+        """SBF reader on the receiver stream, created the first time UBX parsing fails"""
+        if self._sbf_reader is None:
+            from pysbf2 import SBFReader
+
+            self._sbf_reader = SBFReader(self._stream)
+        return self._sbf_reader
+
+    def _read_ntrip(self):
+        while not self._stop_event.is_set():
+            try:
+                # Block for a short time waiting for data (non-busy loop)
+                raw_data = self._ntripbuffer.get(
+                    timeout=1)  # Blocking read, 1s timeout
+                self._serial.write(raw_data[0])
+            except Empty:
+                continue  # No data this second, just keep looping
+            except Exception as e:
+                self.report_error(f"NTRIP Read Error: {e}")
+
+    def _build_dispatch(self):
+        """Map each wanted message identity to its handler"""
+        ubx_handlers = {
+            "NAV-PVT": self._on_nav_pvt,
+            "NAV-ATT": self._on_nav_att,
+            "NAV-EOE": self._on_nav_eoe,
+            "NAV-HPPOSECEF": self._on_nav_hpposecef,
+            "NAV-HPPOSLLH": self._on_nav_hpposllh,
+            "ESF-INS": self._on_esf_ins,
+            "ESF-STATUS": self._on_esf_status,
+            "RXM-RTCM": self._on_rxm_rtcm,
+        }
+        nmea_handlers = {
+            "GNVTG": self._on_vtg,
+            **{f"{talker}GGA": self._on_gga for talker in NMEA_TALKERS},
+            **{f"{talker}GSA": self._on_gsa for talker in NMEA_TALKERS},
+            **{identity: self._on_hrp for identity in NMEA_PROPRIETARY},
+        }
+        sbf_handlers = {
+            "PosCovGeodetic": self._on_pos_cov_geodetic,
+        }
+        # Handled as raw frames, keyed on class/id
+        raw_handlers = {
+            ESF_MEAS_ID: self._on_esf_meas,
+            ESF_RAW_ID: self._on_esf_raw,
+        }
+        self._raw_frames = frozenset(raw_handlers)
+        self._handlers = {**ubx_handlers, **nmea_handlers,
+                          **sbf_handlers, **raw_handlers}
+
+        # UBXReader filters on the UBX class/id and the NMEA address field,
+        # so anything else is framed and skipped without parsing the payload
+        self._msgfilter = tuple(
+            [UBX_MSG_IDS[identity] for identity in ubx_handlers] +
+            sorted({NMEA_PROPRIETARY.get(identity, identity) for identity in nmea_handlers}))
+
+    def decode(self, parsed_data):
+        if isinstance(parsed_data, bytes):
+            handler = self._handlers.get(parsed_data[2:4])
+        else:
+            handler = self._handlers.get(
+                getattr(parsed_data, "identity", None))
+        if handler is not None:
+            handler(parsed_data)
+
+    def flush(self):
+        self._emit_epoch()
+        self._emit_imu()
+
+    def _begin_epoch(self, itow):
+        """Close the open record when a message from a later navigation epoch arrives"""
+        if itow != self._epoch_itow:
+            self._emit_epoch()
+            self._epoch_itow = itow
+
+    def _emit_epoch(self):
+        record = self._current_data
+        self._current_data = GnssEpoch()
+        if record["systemtime"] is None:
+            return  # No position solution in this epoch
+        record.update(self._status)
+        record.update(self._calib_status)
+
+        if (self._ntrip_client is None and
+                self.ntrip_details['start'] and
+                record['lat'] is not None and
+                record['fix'] > 0
+            ):
+            print('STARTING NTRIP client')
+            self._start_ntrip_thread()
+
+        self.emit(record)
+
+    def _begin_imu(self, itow):
+        """Close the open inertial row when NAV-ATT/ESF-INS move on to a later iTOW"""
+        if itow != self._imu_itow:
+            self._emit_imu()
+            self._imu_itow = itow
+            self._imu_epoch = time.time()
+
+    def _emit_imu(self):
+        row, itow = self._current_imu, self._imu_itow
+        self._current_imu = ImuSample()
+        if itow is None or all(row[k] is None for k in dt.imu_template):
+            return
+
+        system_epoch = self._imu_epoch
+        row["systemtime"] = iso_utc(system_epoch)
+        row["systemepoch"] = f"{system_epoch:.3f}"
+        if self._week_epoch is not None:
+            tow = itow / 1000
+            if tow < self._week_tow - SECONDS_PER_WEEK / 2:
+                tow += SECONDS_PER_WEEK     # Week rolled over since the last PVT
+            row["imutime"] = iso_utc(self._week_epoch + tow)
+
+        self._last_imu = row
+        self._changes += 1
+        if self._imu_writer:
+            self._imu_writer.put(self._last_imu)
+
+    def _pvt_epoch(self, parsed_data):
+        """UTC epoch of a NAV-PVT solution; midnight is only recomputed when the date changes"""
+        day = (parsed_data.year, parsed_data.month, parsed_data.day)
+        if day != self._pvt_day:
+            self._pvt_day = day
+            self._pvt_day_epoch = calendar.timegm(day + (0, 0, 0))
+        return (self._pvt_day_epoch + parsed_data.hour * 3600 + parsed_data.min * 60 +
+                parsed_data.second + parsed_data.nano * 1e-9)
+
+    def _on_nav_pvt(self, parsed_data):
+        self._begin_epoch(parsed_data.iTOW)
+        self._pvt_seen = True
+
+        system_epoch = time.time()
+        self._current_data.update({
+            "systemtime": iso_utc(system_epoch),
+            "systemepoch": f"{system_epoch:.3f}",
+            "lat": parsed_data.lat,
+            "lon": parsed_data.lon,
+            "alt": parsed_data.hMSL / 1000,     # m above mean sea level
+            "sep": (parsed_data.height - parsed_data.hMSL) / 1000,    # m
+            "azimuth": parsed_data.headMot,
+            "fix": pvt_fix_quality(parsed_data),
+            "sip": parsed_data.numSV,
+            "speed": parsed_data.gSpeed / 1000,     # m/s
+        })
+        if parsed_data.validDate and parsed_data.validTime:
+            gps_epoch = self._pvt_epoch(parsed_data)
+            # iTOW -> UTC for the inertial stream, leap seconds included
+            self._week_tow = parsed_data.iTOW / 1000
+            self._week_epoch = round(gps_epoch - self._week_tow, 3)
+            self._current_data.update({
+                "gpstime": iso_utc(gps_epoch),
+                "gpsepoch": f"{gps_epoch:.3f}",
+            })
+
+        self._status.update({
+            "gpsFix": GNSS_FIX_FLAGS[parsed_data.fixType],
+            "HDOP": parsed_data.hAcc / 1000,    # m
+            "VDOP": parsed_data.vAcc / 1000,    # m
+            "PDOP": parsed_data.pDOP / 1000,    # no unit
+            "numSV": parsed_data.numSV,
+        })
+
+    def _on_nav_att(self, parsed_data):
+        self._begin_imu(parsed_data.iTOW)
+        roll = parsed_data.roll * DEG_TO_RAD
+        pitch = parsed_data.pitch * DEG_TO_RAD
+        yaw = parsed_data.heading * DEG_TO_RAD
+        quaternion = euler_to_quaternion(roll, pitch, yaw)
+
+        self._current_imu.update({
+            "roll": roll,
+            "pitch": pitch,
+            "yaw": yaw,
+            "qX": quaternion[0],
+            "qY": quaternion[1],
+            "qZ": quaternion[2],
+            "qW": quaternion[3],
+        })
+        self._status.update({
+            "rollAcc": parsed_data.accRoll,
+            "pitchAcc": parsed_data.accPitch,
+            "yawAcc": parsed_data.accHeading,
+        })
+
+    def _on_esf_meas(self, raw_data):
+        payload = memoryview(raw_data)[6:-2]
+        time_tag, flags, _ = ESF_MEAS_HEADER.unpack_from(payload)
+        count = flags >> 11
+        sample = {"sensortime": time_tag, "source": "MEAS"}
+        for (word,) in ESF_MEAS_WORD.iter_unpack(payload[8:8 + 4 * count]):
+            value = esf_value(word)
+            if value:
+                sample[value[0]] = value[1]
+        self._emit_esf(sample)
+
+    def _on_esf_raw(self, raw_data):
+        # Samples sharing a sensor time tag make up one row
+        sample = None
+        for word, s_ttag in ESF_RAW_SAMPLE.iter_unpack(memoryview(raw_data)[10:-2]):
+            if sample is None or sample["sensortime"] != s_ttag:
+                if sample:
+                    self._emit_esf(sample)
+                sample = {"sensortime": s_ttag, "source": "RAW"}
+            value = esf_value(word)
+            if value:
+                sample[value[0]] = value[1]
+        if sample:
+            self._emit_esf(sample)
+
+    def _emit_esf(self, sample):
+        system_epoch = time.time()
+        self._last_esf = EsfSample(sample)
+        self._last_esf.systemtime = iso_utc(system_epoch)
+        self._last_esf.systemepoch = f"{system_epoch:.3f}"
+        if self._esf_writer:
+            self._esf_writer.put(self._last_esf)
+
+    def _on_nav_eoe(self, parsed_data):
+        if parsed_data.iTOW == self._epoch_itow:
+            self._emit_epoch()
+
+    def _on_esf_ins(self, parsed_data):
+        # Compensated vehicle dynamics: m/s^2 and deg/s from the receiver
+        self._begin_imu(parsed_data.iTOW)
+        self._current_imu.update({
+            "accX": parsed_data.xAccel / GRAVITY,
+            "accY": parsed_data.yAccel / GRAVITY,
+            "accZ": parsed_data.zAccel / GRAVITY,
+            "gyroX": parsed_data.xAngRate * DEG_TO_RAD,
+            "gyroY": parsed_data.yAngRate * DEG_TO_RAD,
+            "gyroZ": parsed_data.zAngRate * DEG_TO_RAD,
+        })
+
+    def _on_esf_status(self, parsed_data):
+        self._begin_epoch(parsed_data.iTOW)
+        self._status.update({
+            "imuStatus": "Initialized" if parsed_data.imuInitStatus == 2 else ("Initializing" if parsed_data.imuInitStatus == 1 else "No"),
+            "fusionMode": parsed_data.fusionMode,
+        })
+        sensor_types = {5: "gyroX_calib", 13: "accX_calib",
+                        14: "accY_calib", 16: "accZ_calib", 17: "gyroY_calib", 18: "gyroZ_calib"}
+        for i in range(1, parsed_data.numSens + 1):
+            try:
+                sensor_type = getattr(
+                    parsed_data, f"type_{i:02d}")
+                calib_status_value = getattr(
+                    parsed_data, f"calibStatus_{i:02d}")
+                if sensor_type in sensor_types:
+                    sensor_name = sensor_types[sensor_type]
+                    self._calib_status[sensor_name] = "Calibrated" if calib_status_value in [
+                        2, 3] else ("Calibrating" if calib_status_value == 1 else "Not Calibrated")
+            except AttributeError:
+                print(
+                    f"Warning: Missing sensor data for index {i}")
+
+    def _on_hrp(self, parsed_data):
+        self._current_data.update({
+            "azimuth": parsed_data.hdg,
+            # "roll": parsed_data.roll,
+            # "pitch": parsed_data.pitch,
+        })
+
+    def _on_gsa(self, parsed_data):
+        self._status.update({
+            "HDOP": parsed_data.HDOP,
+            "VDOP": parsed_data.VDOP,
+            "PDOP": parsed_data.PDOP,
+        })
+
+    def _on_gga(self, parsed_data):
+        self._status.update({
+            "HDOP": parsed_data.HDOP,
+            "diffage": parsed_data.diffAge,
+            "diffstation": parsed_data.diffStation
+        })
+        if self._pvt_seen:
+            return  # Position and time come from NAV-PVT
+
+        # GGA only carries the time of day; take the date from the system
+        # clock, picking the day that puts the fix closest to now
+        system_epoch = time.time()
+        gps_time = parsed_data.time
+        gps_epoch = system_epoch - system_epoch % SECONDS_PER_DAY + \
+            gps_time.hour * 3600 + gps_time.minute * 60 + \
+            gps_time.second + gps_time.microsecond * 1e-6
+        if gps_epoch - system_epoch > SECONDS_PER_DAY / 2:
+            gps_epoch -= SECONDS_PER_DAY
+        elif system_epoch - gps_epoch > SECONDS_PER_DAY / 2:
+            gps_epoch += SECONDS_PER_DAY
+
+        self._current_data.update({
+            "systemtime": iso_utc(system_epoch),
+            "systemepoch": f"{system_epoch:.3f}",
+            "gpstime": iso_utc(gps_epoch),
+            "gpsepoch": f"{gps_epoch:.3f}",
+            "lat": parsed_data.lat,
+            "lon": parsed_data.lon,
+            "alt": parsed_data.alt,
+            "sep": parsed_data.sep,
+            "fix": parsed_data.quality,
+            "sip": parsed_data.numSV,
+        })
+        self._emit_epoch()
+
+    def _on_vtg(self, parsed_data):
+        self._current_data["azimuth"] = parsed_data.cogt
+
+    def _on_rxm_rtcm(self, parsed_data):
+        self._status['rtcm_crc'] = parsed_data.crcFailed
+        self._status['rtcm_msg'] = parsed_data.msgUsed
+
+    def _on_nav_hpposecef(self, parsed_data):
+        self._begin_epoch(parsed_data.iTOW)
+        self._status.update({
+            "3D Acc": parsed_data.pAcc / 1000,  # m
+        })
+
+    def _on_nav_hpposllh(self, parsed_data):
+        self._begin_epoch(parsed_data.iTOW)
+        self._status.update({
+            "2D hAcc": parsed_data.hAcc / 1000,  # m
+            "2D vAcc": parsed_data.vAcc / 1000,  # m
+        })
+
+    def _on_pos_cov_geodetic(self, parsed_data):
+        cov_latlat = parsed_data.Cov_latlat
+        cov_lonlon = parsed_data.Cov_lonlon
+        cov_altalt = parsed_data.Cov_hgthgt
+        d2acc = 2 * math.sqrt(cov_latlat + cov_lonlon)
+        d3acc = 2 * \
+            math.sqrt(cov_latlat + cov_lonlon + cov_altalt)
+        self._status.update({
+            "2D hAcc": d2acc,  # m
+            # "2D vAcc": parsed_data.VAccuracy / 100,  # m
+            "3D Acc": d3acc,  # m
+        })
+
+    def get_coordinates(self):
+        return self._last_data
+
+    def get_calib_status(self):
+        return self._calib_status
+
+    def get_status(self):
+        return self._status
+
+    def clear_status(self):
+        self._status = Status()
+        self._calib_status = CalibStatus()
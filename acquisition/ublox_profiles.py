@@ -0,0 +1,74 @@
+"""Receiver configuration profiles applied by Ublox on connect.
+
+A profile describes the receiver state we log with; ``profile_config``
+flattens it into CFG-VALSET key/value pairs for the port the host is on.
+Message rates are per navigation epoch (0 disables the message).
+"""
+
+DYNAMIC_MODELS = {
+    "portable": 0,
+    "stationary": 2,
+    "pedestrian": 3,
+    "automotive": 4,
+    "sea": 5,
+    "airborne1g": 6,
+    "airborne2g": 7,
+    "airborne4g": 8,
+    "wrist": 9,
+    "bike": 10,
+    "mower": 11,
+    "escooter": 12,
+}
+
+PROFILES = {
+    # ZED-F9P (Simple RTK2B/3B Pro)
+    "pro": {
+        "nav_rate": 20,                 # Hz
+        "dynamic_model": "automotive",
+        "baud_rate": None,              # UART1 baud, None leaves it unchanged
+        "protocols": {"UBX": True, "NMEA": False},
+        "messages": {
+            "UBX_NAV_PVT": 1,
+            "UBX_NAV_HPPOSLLH": 1,
+            "UBX_NAV_EOE": 1,
+            "UBX_RXM_RTCM": 1,
+        },
+    },
+    # ZED-F9R (Simple RTK2B/3B Fusion)
+    "fusion": {
+        "nav_rate": 2,                  # Hz, GNSS solution
+        "nav_prio_rate": 20,            # Hz, priority output of PVT/ATT/INS
+        "dynamic_model": "automotive",
+        "baud_rate": None,
+        "protocols": {"UBX": True, "NMEA": False},
+        "messages": {
+            "UBX_NAV_PVT": 1,
+            "UBX_NAV_ATT": 1,
+            "UBX_NAV_HPPOSLLH": 1,
+            "UBX_NAV_EOE": 1,
+            "UBX_ESF_INS": 1,
+            "UBX_ESF_MEAS": 1,
+            "UBX_ESF_STATUS": 10,
+            "UBX_RXM_RTCM": 1,
+        },
+    },
+}
+
+
+def profile_config(profile, port="USB"):
+    """CFG-VALSET (key -> value) items for a profile on the given receiver port"""
+    config = {
+        "CFG_RATE_MEAS": round(1000 / profile["nav_rate"]),    # ms
+        "CFG_RATE_NAV": 1,
+    }
+    if profile.get("nav_prio_rate"):
+        config["CFG_RATE_NAV_PRIO"] = profile["nav_prio_rate"]
+    if profile.get("dynamic_model"):
+        config["CFG_NAVSPG_DYNMODEL"] = DYNAMIC_MODELS[profile["dynamic_model"]]
+    if profile.get("baud_rate"):
+        config["CFG_UART1_BAUDRATE"] = profile["baud_rate"]
+    for protocol, enabled in profile.get("protocols", {}).items():
+        config[f"CFG_{port}OUTPROT_{protocol}"] = int(enabled)
+    for message, rate in profile.get("messages", {}).items():
+        config[f"CFG_MSGOUT_{message}_{port}"] = rate
+    return config
@@ -0,0 +1,467 @@
+import time
+import serial
+import struct
+import datetime
+import numpy as np
+from queue import Empty
+from . import datatypes as dt
+from .driver import SensorDriver
+from .records import WitMotionSample
+from .orientation import euler_to_quaternion_array
+
+
+GRAVITY = 9.80665  # m/s²
+DEG_TO_RAD = np.pi / 180
+PACKET_HEADER = 0x55
+PACKET_SIZE = 11
+
+# Packet type -> (name, payload layout, payload fields, scale per field).
+# Every payload is the 8 bytes between the type byte and the checksum.
+# Scales of None mark payloads that need a non-linear conversion.
+PACKET_TYPES = {
+    0x50: ("time", struct.Struct("<6BH"),
+           ("year", "month", "day", "hour", "minute", "second", "millisecond"), None),
+    0x51: ("acc", struct.Struct("<4h"),
+           ("accX", "accY", "accZ", "temperature"),
+           (16.0 / 32768.0,) * 3 + (0.01,)),                   # g, °C
+    0x52: ("gyro", struct.Struct("<4h"),
+           ("gyroX", "gyroY", "gyroZ", "voltage"),
+           (2000.0 / 32768.0,) * 3 + (0.01,)),                 # deg/s, V
+    0x53: ("angle", struct.Struct("<4h"),
+           ("roll", "pitch", "yaw", "version"),
+           (180.0 / 32768.0,) * 3 + (1,)),                     # deg
+    0x54: ("mag", struct.Struct("<4h"),
+           ("magX", "magY", "magZ", "temperature"),
+           (1, 1, 1, 0.01)),                                   # raw counts, °C
+    0x55: ("port", struct.Struct("<4h"),
+           ("D0", "D1", "D2", "D3"), (1, 1, 1, 1)),
+    0x56: ("pressure", struct.Struct("<ii"),
+           ("pressure", "height"), (1, 0.01)),                 # Pa, m
+    0x57: ("gps", struct.Struct("<ii"),
+           ("gpsLon", "gpsLat"), None),                        # ddmm.mmmmm * 1e5
+    0x58: ("gpsSpeed", struct.Struct("<hhi"),
+           ("gpsHeight", "gpsYaw", "gpsSpeed"), (0.1, 0.01, 0.001)),  # m, deg, km/h
+    0x59: ("quat", struct.Struct("<4h"),
+           ("qW", "qX", "qY", "qZ"), (1.0 / 32768.0,) * 4),
+    0x5A: ("gpsAccuracy", struct.Struct("<4h"),
+           ("gpsSV", "gpsPDOP", "gpsHDOP", "gpsVDOP"), (1, 0.01, 0.01, 0.01)),
+}
+REQUIRED_PACKETS = (0x51, 0x52, 0x53, 0x59)
+
+# Configuration registers, written as FF AA <register> <value low> <value high>
+REG_SAVE = 0x00
+REG_RSW = 0x02      # Output content, bit n enables packet type 0x50 + n
+REG_RRATE = 0x03
+REG_BAUD = 0x04
+REG_KEY = 0x69
+UNLOCK_KEY = 0xB588
+COMMAND_DELAY = 0.1  # s, the device ignores writes sent back to back
+
+# Return rate (Hz) -> RRATE value
+RATE_CODES = {
+    0.2: 0x01, 0.5: 0x02, 1: 0x03, 2: 0x04, 5: 0x05, 10: 0x06,
+    20: 0x07, 50: 0x08, 100: 0x09, 125: 0x0A, 200: 0x0B,
+}
+
+# Baud rate -> BAUD value
+BAUD_CODES = {
+    4800: 0x01, 9600: 0x02, 19200: 0x03, 38400: 0x04, 57600: 0x05,
+    115200: 0x06, 230400: 0x07, 460800: 0x08, 921600: 0x09,
+}
+
+# One 11-byte serial packet: 0x55, type byte, 8 byte payload, checksum
+PACKET_DTYPE = np.dtype([
+    ("header", "u1"),
+    ("type", "u1"),
+    ("payload", "V8"),
+    ("checksum", "u1"),
+])
+
+# BLE 5.0 devices (WT901BLE) notify one combined 20-byte frame per sample:
+# 0x55, 0x61, then acc, gyro and angle as int16 triplets, no checksum
+BLE_PACKET_SIZE = 20
+BLE_DATA_FLAG = 0x61
+BLE_PACKET_DTYPE = np.dtype([
+    ("header", "u1"),
+    ("flag", "u1"),
+    ("acc", "<i2", (3,)),
+    ("gyro", "<i2", (3,)),
+    ("angle", "<i2", (3,)),
+])
+BLE_COLUMNS = (
+    ("acc", ("accX", "accY", "accZ"), 16.0 / 32768.0),          # g
+    ("gyro", ("gyroX", "gyroY", "gyroZ"), 2000.0 / 32768.0),    # deg/s
+    ("angle", ("roll", "pitch", "yaw"), 180.0 / 32768.0),       # deg
+)
+
+
+def _payload_dtype(layout, fields):
+    """NumPy dtype matching a little-endian struct layout"""
+    formats = []
+    count = ""
+    for code in layout.format.lstrip("<"):
+        if code.isdigit():
+            count += code
+            continue
+        formats += ["<" + code] * int(count or 1)
+        count = ""
+    return np.dtype({"names": list(fields), "formats": formats})
+
+
+PAYLOAD_DTYPES = {
+    packet_type: _payload_dtype(layout, fields)
+    for packet_type, (_, layout, fields, _) in PACKET_TYPES.items()
+}
+
+
+def _device_epoch_ms(payload):
+    """Milliseconds since the Unix epoch from 0x50 time packets"""
+    months = (payload["year"].astype(np.int64) + 30) * 12 + payload["month"] - 1
+    days = months.astype("datetime64[M]").astype("datetime64[D]") + (payload["day"].astype(np.int64) - 1)
+    ms = (payload["hour"].astype(np.int64) * 3600000 + payload["minute"].astype(np.int64) * 60000
+          + payload["second"].astype(np.int64) * 1000 + payload["millisecond"])
+    return (days.astype("datetime64[ms]").astype(np.int64) + ms).astype(np.float64)
+
+
+def _ddmm_to_degrees(value):
+    """Convert the packed ddmm.mmmmm * 1e5 GPS format to decimal degrees"""
+    degrees = np.trunc(value / 1e7)
+    return degrees + (value - degrees * 1e7) / 1e5 / 60.0
+
+
+# Payloads that do not scale linearly: packet type -> function(payload) -> columns
+PACKET_CONVERTERS = {
+    0x50: lambda payload: {"imutime": _device_epoch_ms(payload)},
+    0x57: lambda payload: {"gpsLon": _ddmm_to_degrees(payload["gpsLon"]),
+                           "gpsLat": _ddmm_to_degrees(payload["gpsLat"])},
+}
+
+
+class WitMotionFramer():
+    """Split a raw WitMotion byte stream into checksum-validated packets.
+
+    Incoming bytes are appended to one reusable bytearray. Each call to
+    ``feed`` returns every complete packet found so far as a single
+    ``bytes`` object (a multiple of ``packet_size``, header included) and
+    keeps any trailing partial packet for the next call. After corruption
+    the framer resyncs on the next 0x55 header that validates; the skipped
+    bytes are counted in ``discarded``.
+    """
+    packet_size = PACKET_SIZE
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.packets = 0
+        self.discarded = 0
+        self.checksum_errors = 0
+
+    def _is_valid(self, buffer, pos, stop):
+        return sum(buffer[pos:stop - 1]) & 0xFF == buffer[stop - 1]
+
+    def feed(self, data):
+        buffer = self._buffer
+        buffer += data
+        frames = bytearray()
+        size = self.packet_size
+        end = len(buffer)
+        pos = 0
+
+        while end - pos >= size:
+            if buffer[pos] != PACKET_HEADER:
+                header = buffer.find(PACKET_HEADER, pos + 1)
+                if header < 0:
+                    self.discarded += end - pos
+                    pos = end
+                    break
+                self.discarded += header - pos
+                pos = header
+                continue
+
+            stop = pos + size
+            if not self._is_valid(buffer, pos, stop):
+                # False header or corrupted packet, resync from the next byte
+                self.checksum_errors += 1
+                self.discarded += 1
+                pos += 1
+                continue
+
+            frames += buffer[pos:stop]
+            pos = stop
+
+        del buffer[:pos]
+        self.packets += len(frames) // size
+        return bytes(frames)
+
+
+class WitMotionBLEFramer(WitMotionFramer):
+    """Framer for the combined 20-byte 0x55 0x61 frames of BLE 5.0 devices.
+
+    These frames carry no checksum, so a header is accepted when it is
+    followed by the data flag.
+    """
+    packet_size = BLE_PACKET_SIZE
+
+    def _is_valid(self, buffer, pos, stop):
+        return buffer[pos + 1] == BLE_DATA_FLAG
+
+
+class WitMotionDecoder():
+    """Decode batches of framed packets into column arrays, one row per sample.
+
+    The device sends the packets of one output cycle in ascending type
+    order, so a new sample starts wherever the type byte stops increasing.
+    A trailing sample that has not reached the end of the cycle is held
+    back and completed by the next batch. Only samples containing every
+    packet type in ``required`` are returned, with the columns listed in
+    ``fields`` (NaN where the device did not send that packet type).
+    """
+
+    def __init__(self, fields, required=REQUIRED_PACKETS):
+        self.fields = tuple(fields)
+        self.required = required
+        self._pending = b""
+        self._cycle_end = None
+
+    def decode(self, frames):
+        data = self._pending + frames
+        packets = np.frombuffer(data, dtype=PACKET_DTYPE)
+        if len(packets) == 0:
+            return {}
+
+        types = packets["type"]
+        starts = np.empty(len(types), dtype=bool)
+        starts[0] = True
+        np.less_equal(types[1:], types[:-1], out=starts[1:])
+
+        boundaries = np.flatnonzero(starts)
+        if len(boundaries) > 1:
+            self._cycle_end = types[boundaries[-1] - 1]
+
+        # Hold back the last sample unless it already ends the cycle
+        if types[-1] == self._cycle_end:
+            self._pending = b""
+        else:
+            self._pending = data[boundaries[-1] * PACKET_SIZE:]
+            packets = packets[:boundaries[-1]]
+            types = types[:boundaries[-1]]
+            starts = starts[:boundaries[-1]]
+
+        count = int(np.count_nonzero(starts))
+        if count == 0:
+            return {}
+
+        sample = np.cumsum(starts) - 1
+        complete = np.ones(count, dtype=bool)
+        for packet_type in self.required:
+            present = np.zeros(count, dtype=bool)
+            present[sample[types == packet_type]] = True
+            complete &= present
+
+        columns = {name: np.full(count, np.nan) for name in self.fields}
+        for packet_type in np.unique(types).tolist():
+            if packet_type not in PACKET_TYPES:
+                continue
+            mask = types == packet_type
+            rows = sample[mask]
+            _, _, fields, scales = PACKET_TYPES[packet_type]
+            payload = packets["payload"][mask].view(PAYLOAD_DTYPES[packet_type])
+            if scales is None:
+                values = PACKET_CONVERTERS[packet_type](payload)
+            else:
+                values = {field: payload[field] * scale
+                          for field, scale in zip(fields, scales) if field in columns}
+
+            for name, value in values.items():
+                if name in columns:
+                    columns[name][rows] = value
+
+        return {name: column[complete] for name, column in columns.items()}
+
+
+class WitMotionBLEDecoder():
+    """Decode batches of combined BLE frames into column arrays.
+
+    Every frame is a complete sample. The frame carries no quaternion, so it
+    is derived from the angles; other columns in ``fields`` are NaN.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.required = ()
+
+    def decode(self, frames):
+        packets = np.frombuffer(frames, dtype=BLE_PACKET_DTYPE)
+        count = len(packets)
+        if count == 0:
+            return {}
+
+        columns = {name: np.full(count, np.nan) for name in self.fields}
+        for group, names, scale in BLE_COLUMNS:
+            values = packets[group] * scale
+            for i, name in enumerate(names):
+                if name in columns:
+                    columns[name] = values[:, i]
+
+        if "qW" in columns:
+            angles = packets["angle"] * (np.pi / 32768.0)   # rad
+            quaternion = euler_to_quaternion_array(
+                angles[:, 0], angles[:, 1], angles[:, 2])
+            for i, name in enumerate(("qX", "qY", "qZ", "qW")):
+                columns[name] = quaternion[:, i]
+        return columns
+
+
+class WitMotion(SensorDriver):
+    """WitMotion IMU on a serial port, or on a Bluetooth link via ``socket``.
+
+    ``socket`` is a queue of (timestamp, frames) batches already framed by
+    the Bluetooth reader; ``protocol`` selects the serial or the BLE 5.0
+    packet format.
+    """
+    name = "witmotion_data"
+    template = {**dt.time_template, **dt.imu_template, **dt.witmotion_template}
+    record_type = WitMotionSample
+
+    def __init__(self, **kwargs):
+        self.imu_port = kwargs.get("imu_port", None)
+        self.baud_rate = kwargs.get("baud_rate", 115200)
+        self.socket = kwargs.get("socket", None)
+        self.config = kwargs.get("config", None)
+        self.protocol = kwargs.get("protocol", "serial")
+        self.serial = None
+        super().__init__(**kwargs)
+
+        fields = [k for k in self.template if k not in dt.time_template]
+        if self.protocol == "ble":
+            self._framer = WitMotionBLEFramer()
+            self._decoder = WitMotionBLEDecoder(fields)
+        else:
+            self._framer = WitMotionFramer()
+            self._decoder = WitMotionDecoder(fields)
+        self._dtype = self.record_dtype()
+
+        self.start()
+
+    def open(self):
+        """Start reading from the IMU"""
+        if self.imu_port:
+            self.serial = serial.Serial(
+                self.imu_port, self.baud_rate, timeout=1)
+            if self.config:
+                rate = self.configure(**self.config)
+                print(f"WitMotion configured, measured {rate:.1f} Hz")
+        elif self.socket is None:
+            raise ValueError("No valid IMU port or socket provided")
+
+    def interrupt(self):
+        if self.serial and self.serial.is_open:
+            self.serial.cancel_read()  # Wake the blocking read
+
+    def close(self):
+        """Stop reading from the IMU"""
+        if self.serial and self.serial.is_open:
+            self.serial.close()
+
+    def configure(self, rate=None, outputs=None, baud_rate=None, measure_time=2.0):
+        """Write output rate, packet content and baud rate to the device.
+
+        ``rate`` is a return rate in Hz from RATE_CODES, ``outputs`` a list
+        of packet names from PACKET_TYPES (e.g. ["acc", "gyro", "angle",
+        "quat"]) and ``baud_rate`` a key of BAUD_CODES. The port is reopened
+        at the new baud rate. Must be called with the port open and before
+        the read threads start. Returns the measured sample rate in Hz.
+        """
+        if rate is not None and rate not in RATE_CODES:
+            raise ValueError(f"Unsupported WitMotion rate {rate} Hz")
+        if baud_rate is not None and baud_rate not in BAUD_CODES:
+            raise ValueError(f"Unsupported WitMotion baud rate {baud_rate}")
+
+        writes = []
+        if outputs is not None:
+            enabled = [packet_type for packet_type, entry in PACKET_TYPES.items()
+                       if entry[0] in outputs]
+            writes.append((REG_RSW, sum(1 << (packet_type - 0x50)
+                                        for packet_type in enabled)))
+            self._decoder.required = tuple(
+                packet_type for packet_type in REQUIRED_PACKETS if packet_type in enabled)
+        if rate is not None:
+            writes.append((REG_RRATE, RATE_CODES[rate]))
+
+        if writes:
+            self._write_registers(writes)
+
+        if baud_rate is not None and baud_rate != self.baud_rate:
+            # The device switches speed as soon as the register is written,
+            # so the change is saved again once the port has been reopened
+            self._write_registers([(REG_BAUD, BAUD_CODES[baud_rate])])
+            self.serial.close()
+            self.baud_rate = baud_rate
+            self.serial = serial.Serial(
+                self.imu_port, self.baud_rate, timeout=1)
+            self._write_registers([])
+
+        return self._measure_rate(measure_time)
+
+    def _write_registers(self, writes):
+        """Unlock the device, write (register, value) pairs and save"""
+        for register, value in [(REG_KEY, UNLOCK_KEY), *writes, (REG_SAVE, 0)]:
+            self.serial.write(bytes(
+                (0xFF, 0xAA, register, value & 0xFF, (value >> 8) & 0xFF)))
+            self.serial.flush()
+            time.sleep(COMMAND_DELAY)
+
+    def _measure_rate(self, duration):
+        """Count samples on the port for ``duration`` seconds"""
+        framer = WitMotionFramer()
+        frames = bytearray()
+        self.serial.reset_input_buffer()
+        start = time.monotonic()
+        while time.monotonic() - start < duration:
+            frames += framer.feed(self.serial.read(
+                max(self.serial.in_waiting, 1)))
+        elapsed = time.monotonic() - start
+
+        types = np.frombuffer(bytes(frames), dtype=PACKET_DTYPE)["type"]
+        if len(types) == 0:
+            return 0.0
+        # Every enabled packet type is sent once per sample
+        return np.bincount(types).max() / elapsed
+
+    def read(self):
+        if self.socket is not None:
+            try:
+                return self.socket.get(timeout=1)  # This is a multiprocessing.Queue
+            except Empty:
+                return ()
+
+        # Block for the first byte, then drain everything already buffered
+        data = self.serial.read(max(self.serial.in_waiting, 1))
+        discarded = self._framer.discarded
+        frames = self._framer.feed(data) if data else b""
+
+        if self._framer.discarded != discarded:
+            self.report_error(
+                f"IMU resync: discarded {self._framer.discarded - discarded} bytes ({self._framer.discarded} total)")
+        return ((time.time(), frames),) if frames else ()
+
+    def decode(self, item):
+        """Decode a batch of IMU packets into complete samples"""
+        timestamp, frames = item
+        columns = self._decoder.decode(frames)
+        if not columns:
+            return
+
+        # Special yaw correction, angles in radians with yaw in [0, 2pi)
+        columns["roll"] = columns["roll"] * DEG_TO_RAD
+        columns["pitch"] = columns["pitch"] * DEG_TO_RAD
+        columns["yaw"] = ((columns["yaw"] + 360) % 360) * DEG_TO_RAD
+
+        # Every sample in a batch shares the time the batch was read
+        samples = np.empty(len(columns["roll"]), self._dtype)
+        samples["systemepoch"] = timestamp * 1000
+        samples["systemtime"] = datetime.datetime.fromtimestamp(
+            timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")
+        for name, column in columns.items():
+            samples[name] = column
+        self.emit_batch(samples)
+
@@ -1,99 +1,282 @@
 import os
+import sys
 import time
+import signal
 import datetime
 import argparse
-from ublox import Ublox
-from witmotion import WitMotion
-from microstrain import Microstrain
-from multiprocessing import Process, Queue
+from queue import Empty
+from multiprocessing import Process, Pipe, Lock
+from multiprocessing.connection import wait
+
+# The drivers live in the acquisition package at the repository root. They
+# are imported only for the sensors in use, so a run without a Microstrain
+# never loads mscl and spawned children do not re-import every driver.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from acquisition.ring import SharedRing
+from acquisition.snapshot import Snapshot
+from acquisition.buffers import POLICIES, BLOCK
+from acquisition.driver import FLUSH_INTERVAL, FSYNC_INTERVAL
 
 TIME = None
+STATUS_INTERVAL = 1    # s between status lines
+RESTART_HOLDOFF = 5    # s a child must have run before it is restarted
+STOP_TIMEOUT = 10      # s a child gets to flush its files before it is killed
 
 def set_time():
     print("Time set to")
     os.system('sudo date --set="%s"' % TIME)
 
 
+def witmotion_config(args):
+    config = {}
+    if args.witmotion_rate is not None:
+        config["rate"] = args.witmotion_rate
+    if args.witmotion_outputs is not None:
+        config["outputs"] = args.witmotion_outputs
+    if args.witmotion_set_baud is not None:
+        config["baud_rate"] = args.witmotion_set_baud
+    return config or None
+
+
+def ublox_profile(args, default):
+    if args.ublox_profile is None:
+        return default
+    return None if args.ublox_profile == "none" else args.ublox_profile
+
+
+def run_driver(driver, kwargs):
+    """Child process: Ctrl-C reaches the whole process group, but the parent stops the children"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    driver(**kwargs)
+
+
+class ErrorPipe():
+    """Error channel of one sensor: the driver put()s messages, the supervisor waits on ``reader``"""
+
+    def __init__(self):
+        self.reader, self._writer = Pipe(duplex=False)
+        self._lock = Lock()     # The driver reports from several threads
+
+    def put(self, message):
+        with self._lock:
+            self._writer.send(message)
+
+    def get_nowait(self):
+        if not self.reader.poll():
+            raise Empty
+        return self.reader.recv()
+
+    def close(self):
+        self.reader.close()
+        self._writer.close()
+
+
+class Sensor():
+    """A driver process with the snapshot, ring and error queue it reports through"""
+
+    def __init__(self, name, driver, kwargs, status_interval):
+        self.name = name
+        self.driver = driver
+        self.snapshot = Snapshot.create()
+        self.ring = SharedRing.create(driver.record_dtype())
+        self.errors = ErrorPipe()
+        self.kwargs = {
+            **kwargs,
+            "snapshot": self.snapshot.name,
+            "ring": self.ring.name,
+            f"{driver.kind}_error_queue": self.errors,
+            "display_timer": status_interval,
+        }
+        self.reader = self.ring.reader(latest=False)
+        self.version = 0
+        self.last_data = {}
+        self.samples = 0
+        self.restarts = 0
+        self.process = None
+        self.started = None
+        self.start()
+
+    def start(self):
+        self.process = Process(target=run_driver, args=(self.driver, self.kwargs))
+        self.process.start()
+        self.started = time.monotonic()
+
+    def join(self):
+        """Wait for the child to exit, killing it if it has not within STOP_TIMEOUT"""
+        self.process.join(STOP_TIMEOUT)
+        if self.process.is_alive():
+            print(f"{self.name}: process did not exit within {STOP_TIMEOUT} s, killing it")
+            self.process.kill()
+            self.process.join()
+
+    def waitables(self):
+        """Objects connection.wait() returns when this sensor needs attention"""
+        objects = [self.errors.reader]     # Readable once an error was put
+        if self.process is not None:
+            objects.append(self.process.sentinel)
+        return objects
+
+    def print_errors(self):
+        while True:
+            try:
+                print(f"{self.name}: {self.errors.get_nowait()}")
+            except Empty:
+                break
+
+    def exited(self, restart):
+        """Report a child that died and restart it if it ran long enough to be worth it"""
+        self.join()
+        self.print_errors()
+        uptime = time.monotonic() - self.started
+        print(f"{self.name}: process exited with code {self.process.exitcode} "
+              f"after {uptime:.1f} s")
+        if restart and uptime >= RESTART_HOLDOFF:
+            self.restarts += 1
+            print(f"{self.name}: restarting ({self.restarts})")
+            self.start()
+        else:
+            self.process = None
+
+    def count_samples(self):
+        """Count the records written to the ring since the last call; returns the backlog"""
+        backlog = self.ring.head - self.reader.cursor
+        batch = self.reader.read()
+        while len(batch):
+            self.samples += len(batch)
+            batch = self.reader.read()
+        return backlog
+
+    def status(self, elapsed):
+        """One-line summary: sample rate, last fix, ring backlog, overruns"""
+        before = self.samples
+        backlog = self.count_samples()
+        self.version, data = self.snapshot.read_if_changed(self.version)
+        if data is not None:
+            self.last_data = data
+
+        line = f"{self.name} {(self.samples - before) / elapsed:6.1f} Hz"
+        if "fix" in self.last_data:
+            line += f" fix {self.last_data['fix'] or '-'}"
+        line += f" ring {backlog}/{self.ring.capacity}"
+        if self.reader.lost:
+            line += f" lost {self.reader.lost}"
+        if self.process is None:
+            line += " DEAD"
+        return line
+
+    def stop(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.join()
+        self.print_errors()
+        self.count_samples()
+        print(f"{self.name}: {self.samples} samples, {self.reader.lost} overrun")
+        self.ring.close()
+        self.snapshot.close()
+        self.errors.close()
+
+
+def supervise(sensors, status_interval, restart):
+    """Sleep until a child reports an error or dies, printing a status line every interval"""
+    last_status = time.monotonic()
+    while True:
+        owners = {}
+        for sensor in sensors:
+            for obj in sensor.waitables():
+                owners[obj] = sensor
+
+        timeout = max(0, last_status + status_interval - time.monotonic())
+        for obj in wait(list(owners), timeout):
+            sensor = owners[obj]
+            if sensor.process is not None and obj == sensor.process.sentinel:
+                sensor.exited(restart)
+            else:
+                sensor.print_errors()
+
+        now = time.monotonic()
+        if now - last_status >= status_interval:
+            elapsed, last_status = now - last_status, now
+            print(time.strftime("%H:%M:%S"), " | ".join(
+                sensor.status(elapsed) for sensor in sensors), flush=True)
+
+
 def main(args):
-    processes = []
-    queues = []
+    sensors = []
     currentTime = datetime.datetime.now()
     currentTime = currentTime.strftime("%Y-%m-%d_%H-%M-%S")
     args.path = os.path.join(args.path, currentTime)
+    if args.spill_path is None:
+        args.spill_path = args.path
 
     if args.witmotion:
-        witmotion_queue = Queue()
-        witmotion = Process(
-                    target=WitMotion,
-                    kwargs={
-                        "imu_port": args.witmotion[0],
-                        "baud_rate": int(args.witmotion[1]),
-                        "save_data": args.save,
-                        "save_path":  args.path,
-                        "imu_queue": witmotion_queue,
-                        "display_timer": 0.1,
-                    }
-                )
-        processes.append(witmotion)
-        queues.append(witmotion_queue)
-        witmotion.start()
+        from acquisition.witmotion import WitMotion
+        sensors.append(Sensor("witmotion", WitMotion, {
+            "imu_port": args.witmotion[0],
+            "baud_rate": int(args.witmotion[1]),
+            "save_data": args.save,
+            "save_path": args.path,
+            "buffer_policy": args.buffer_policy,
+            "spill_path": args.spill_path,
+            "save_format": args.format,
+            "compression": args.compress,
+            "flush_interval": args.flush_interval,
+            "fsync_interval": args.fsync_interval,
+            "config": witmotion_config(args),
+        }, args.status_interval))
         print(f"Witmotion on {args.witmotion[0]} at {args.witmotion[1]} baud")
     if args.ublox_pro:
-        ublox_pro_queue = Queue()
-        ublox_pro = Process(
-                    target=Ublox,
-                    kwargs={
-                        "gps_port": args.ublox_pro[0],
-                        "baud_rate": int(args.ublox_pro[1]),
-                        "fusion": False,
-                        "save_data": args.save,
-                        "save_path": args.path,
-                        # "ntrip_details": self.mainWindow.ntrip_details,
-                        "gps_queue": ublox_pro_queue,
-                        "display_timer": 0.1,
-                    }
-                )
-        
-        processes.append(ublox_pro)
-        queues.append(ublox_pro_queue)
-        ublox_pro.start()
+        from acquisition.ublox import Ublox
+        sensors.append(Sensor("ublox_pro", Ublox, {
+            "gps_port": args.ublox_pro[0],
+            "baud_rate": int(args.ublox_pro[1]),
+            "fusion": False,
+            "save_data": args.save,
+            "save_path": args.path,
+            "buffer_policy": args.buffer_policy,
+            "spill_path": args.spill_path,
+            "save_format": args.format,
+            "compression": args.compress,
+            "flush_interval": args.flush_interval,
+            "fsync_interval": args.fsync_interval,
+            # "ntrip_details": self.mainWindow.ntrip_details,
+            "raw_observables": args.ublox_rawx,
+            "profile": ublox_profile(args, "pro"),
+        }, args.status_interval))
         print(f"Ublox Pro on {args.ublox_pro[0]} at {args.ublox_pro[1]} baud")
     if args.ublox_fusion:
-        ublox_fusion_queue = Queue()
-        ublox_fusion = Process(
-                    target=Ublox,
-                    kwargs={
-                        "gps_port": args.ublox_fusion[0],
-                        "baud_rate": int(args.ublox_fusion[1]),
-                        "fusion": True,
-                        "save_data": args.save,
-                        "save_path": args.path,
-                         # "ntrip_details": self.mainWindow.ntrip_details,
-                        "gps_queue": ublox_fusion_queue,
-                        "display_timer": 0.1,
-                    }
-                )
-        processes.append(ublox_fusion)
-        queues.append(ublox_fusion_queue)
-        ublox_fusion.start()
+        from acquisition.ublox import Ublox
+        sensors.append(Sensor("ublox_fusion", Ublox, {
+            "gps_port": args.ublox_fusion[0],
+            "baud_rate": int(args.ublox_fusion[1]),
+            "fusion": True,
+            "save_data": args.save,
+            "save_path": args.path,
+            "buffer_policy": args.buffer_policy,
+            "spill_path": args.spill_path,
+            "save_format": args.format,
+            "compression": args.compress,
+            "flush_interval": args.flush_interval,
+            "fsync_interval": args.fsync_interval,
+            # "ntrip_details": self.mainWindow.ntrip_details,
+            "raw_observables": args.ublox_rawx,
+            "profile": ublox_profile(args, "fusion"),
+        }, args.status_interval))
         print(
             f"Ublox Fusion on {args.ublox_fusion[0]} at {args.ublox_fusion[1]} baud")
     if args.microstrain:
-        microstrain_queue = Queue()
-        microstrain = Process(
-                    target=Microstrain,
-                    kwargs={
-                        "imu_port": args.microstrain[0],
-                        "baud_rate": int(args.microstrain[1]),
-                        "save_data": args.save,
-                        "save_path":  args.path,
-                        "imu_queue": microstrain_queue,
-                        "display_timer": 0.1,
-                    }
-                )
-        processes.append(microstrain)
-        queues.append(microstrain_queue)
-        microstrain.start()
+        from acquisition.microstrain import Microstrain
+        sensors.append(Sensor("microstrain", Microstrain, {
+            "imu_port": args.microstrain[0],
+            "baud_rate": int(args.microstrain[1]),
+            "save_data": args.save,
+            "save_path": args.path,
+            "buffer_policy": args.buffer_policy,
+            "spill_path": args.spill_path,
+            "save_format": args.format,
+            "compression": args.compress,
+            "flush_interval": args.flush_interval,
+            "fsync_interval": args.fsync_interval,
+        }, args.status_interval))
         print(
             f"Microstrain on {args.microstrain[0]} at {args.microstrain[1]} baud")
     print(f"Path: {args.path}")
@@ -102,25 +285,12 @@ def main(args):
     global TIME
     TIME = datetime.datetime.now()
     set_time()    # Start the GPS and IMU
-    count = 0
 
     try:
-        while True:
-            for queue in queues:
-                if not queue.empty():
-                    data = queue.get()
-                    print("Data:", data)
-            time.sleep(0.1)
+        supervise(sensors, args.status_interval, args.restart)
     except KeyboardInterrupt:
-        for process in processes:
-            if process.is_alive():
-                process.terminate()
-                process.join()
-            
-        for queue in queues:
-            queue.close()
-            queue.join_thread()
-
+        for sensor in sensors:
+            sensor.stop()
 
 
 if __name__ == "__main__":
@@ -128,10 +298,20 @@ if __name__ == "__main__":
 
     parser.add_argument("--witmotion", nargs=2, metavar=("PORT", "BAUDRATE"),
                         help="Witmotion: <port> <baudrate> (default baudrate: 115200)")
+    parser.add_argument("--witmotion-rate", type=float, metavar="HZ",
+                        help="Witmotion: set the output rate (0.2-200 Hz)")
+    parser.add_argument("--witmotion-outputs", nargs="+", metavar="PACKET",
+                        help="Witmotion: packets to output, e.g. acc gyro angle quat (also time, mag, pressure, gps, gpsSpeed)")
+    parser.add_argument("--witmotion-set-baud", type=int, metavar="BAUDRATE",
+                        help="Witmotion: switch the device to a new baudrate")
     parser.add_argument("--ublox-pro", nargs=2, metavar=("PORT", "BAUDRATE"),
                         help="Ublox Simple RTK2B/3B Pro: <port> <baudrate> (default baudrate: 115200)")
     parser.add_argument("--ublox-fusion", nargs=2, metavar=("PORT", "BAUDRATE"),
                         help="Ublox Simple RTK2B/3B Fusion: <port> <baudrate> (default baudrate: 115200)")
+    parser.add_argument("--ublox-rawx", type=float, metavar="HZ",
+                        help="Ublox: enable RXM-RAWX/SFRBX raw observables (up to 10 Hz) for PPK/RINEX")
+    parser.add_argument("--ublox-profile", choices=["pro", "fusion", "none"],
+                        help="Ublox: configuration profile applied on connect (default: matches the receiver, none: leave as is)")
     parser.add_argument("--microstrain", nargs=2, metavar=("PORT", "BAUDRATE"),
                         help="Microstrain 3DM-CV7-AHRS: <port> <baudrate> (default baudrate: 115200)")
 
@@ -139,8 +319,26 @@ if __name__ == "__main__":
                         action="store_true", help="Enable saving of data")
     parser.add_argument("--path", type=str, default="test",
                         help="Output path (default: test)")
+    parser.add_argument("--format", choices=["csv", "arrow", "parquet"], default="csv",
+                        help="Recording format: CSV, Arrow IPC streams, or Arrow converted to Parquet on exit (arrow/parquet need pyarrow, default: csv)")
+    parser.add_argument("--compress", choices=["gzip", "zstd"],
+                        help="Compress recordings as they are written (CSV: gzip or zstd in seekable frames, zstd needs the zstandard package; Arrow/Parquet: zstd only)")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL, metavar="SECONDS",
+                        help=f"Longest a sample waits before it is written to the file (default: {FLUSH_INTERVAL})")
+    parser.add_argument("--fsync-interval", type=float, default=FSYNC_INTERVAL, metavar="SECONDS",
+                        help=f"Longest written data waits before it is synced to disk, 0 for only on exit (default: {FSYNC_INTERVAL})")
+    parser.add_argument("--buffer-policy", choices=POLICIES, default=BLOCK,
+                        help="What a full buffer does with new data: wait for room, drop the oldest item or spill to disk (default: block)")
+    parser.add_argument("--spill-path", metavar="DIR",
+                        help="Directory for the spill files of --buffer-policy spill; keep it off tmpfs (default: the session output path)")
+    parser.add_argument("--status-interval", type=float, default=STATUS_INTERVAL,
+                        help=f"Seconds between status lines (default: {STATUS_INTERVAL})")
+    parser.add_argument("--restart", default=False, action="store_true",
+                        help=f"Restart a sensor process that exits after running at least {RESTART_HOLDOFF} s")
 
     args = parser.parse_args()
+    if args.compress == "gzip" and args.format != "csv":
+        parser.error(f"--format {args.format} only supports --compress zstd")
 
     # Set default baudrates if not provided
     default_baud = "115200"
@@ -0,0 +1,149 @@
+"""Measure how long the sensor drivers take to start.
+
+For every driver module, a fresh interpreter imports it ``--repeat`` times
+and the median import time is reported together with the heavy optional
+modules that were loaded on the way (they should only appear when the
+driver really needs them). With a port given, the driver is also started
+in a spawned process (the start method used on macOS/Windows and the
+costliest one) and the time until its first sample reaches the display
+queue is reported.
+
+    python startup_benchmark.py
+    python startup_benchmark.py --ublox /dev/ttyACM0 115200 --witmotion /dev/ttyUSB0 115200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import multiprocessing
+from queue import Empty
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DRIVERS = {
+    "ublox": ("acquisition.ublox", "Ublox", "gps"),
+    "witmotion": ("acquisition.witmotion", "WitMotion", "imu"),
+    "microstrain": ("acquisition.microstrain", "Microstrain", "imu"),
+}
+HEAVY_MODULES = ("PySide6", "scipy", "numpy", "pyarrow", "zstandard", "pygnssutils", "pysbf2", "mscl")
+FIRST_SAMPLE_TIMEOUT = 30   # s
+
+IMPORT_PROBE = """
+import sys, json, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+try:
+    __import__({module!r})
+    error = None
+except Exception as e:
+    error = repr(e)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "error": error,
+                  "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module, repeat):
+    """Median import time of ``module`` in a fresh interpreter"""
+    probe = IMPORT_PROBE.format(root=ROOT, module=module, heavy=HEAVY_MODULES)
+    times = []
+    result = {}
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", probe],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        if result["error"]:
+            break
+        times.append(result["seconds"])
+    result["seconds"] = statistics.median(times) if times else None
+    return result
+
+
+def measure_interpreter(repeat):
+    """Median wall time of starting and stopping a bare interpreter"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def measure_first_sample(name, port, baud_rate):
+    """Seconds from Process.start() to the first sample on the display queue"""
+    module, cls, kind = DRIVERS[name]
+    driver = getattr(__import__(module, fromlist=[cls]), cls)
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    error_queue = context.Queue()
+    kwargs = {
+        f"{kind}_port": port,
+        "baud_rate": baud_rate,
+        f"{kind}_queue": queue,
+        f"{kind}_error_queue": error_queue,
+        "display_timer": 0.01,
+    }
+    if name == "ublox":
+        kwargs["profile"] = None    # Configuration time is not startup time
+
+    process = context.Process(target=driver, kwargs=kwargs)
+    start = time.perf_counter()
+    process.start()
+    elapsed = None
+    try:
+        while time.perf_counter() - start < FIRST_SAMPLE_TIMEOUT:
+            try:
+                data = queue.get(timeout=0.1)
+            except Empty:
+                if not process.is_alive():
+                    break
+                continue
+            if data.get("systemtime"):
+                elapsed = time.perf_counter() - start
+                break
+    finally:
+        process.terminate()
+        process.join()
+    while not error_queue.empty():
+        print(f"  {name}: {error_queue.get()}")
+    return elapsed
+
+
+def main(args):
+    interpreter = measure_interpreter(args.repeat)
+    print(f"Interpreter start: {interpreter * 1000:.0f} ms")
+
+    for name, (module, _, _) in DRIVERS.items():
+        result = measure_import(module, args.repeat)
+        if result["error"]:
+            print(f"{module}: import failed, {result['error']}")
+            continue
+        loaded = ", ".join(result["loaded"]) or "none"
+        print(f"{module}: {result['seconds'] * 1000:.0f} ms, heavy modules: {loaded}")
+
+    for name in DRIVERS:
+        device = getattr(args, name)
+        if device is None:
+            continue
+        elapsed = measure_first_sample(name, device[0], int(device[1]))
+        if elapsed is None:
+            print(f"{name}: no sample within {FIRST_SAMPLE_TIMEOUT} s")
+        else:
+            print(f"{name}: first sample after {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sensor driver startup benchmark")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Fresh interpreters per measurement (default: 5)")
+    parser.add_argument("--ublox", nargs=2, metavar=("PORT", "BAUDRATE"),
+                        help="Time to first sample of a Ublox receiver")
+    parser.add_argument("--witmotion", nargs=2, metavar=("PORT", "BAUDRATE"),
+                        help="Time to first sample of a WitMotion IMU")
+    parser.add_argument("--microstrain", nargs=2, metavar=("PORT", "BAUDRATE"),
+                        help="Time to first sample of a Microstrain IMU")
+    main(parser.parse_args())
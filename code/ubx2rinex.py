@@ -0,0 +1,344 @@
+"""Convert a raw u-blox log (.ubx) into RINEX 3 observation and navigation files.
+
+Observations come from RXM-RAWX and GPS LNAV ephemerides from RXM-SFRBX.
+The log is streamed through generators, twice for the observation file (the
+header needs the signals present and the first epoch before any epoch can be
+written), so memory use does not grow with the session length.
+
+Usage: python ubx2rinex.py ublox_data_pro_1.ubx [--obs OUT.obs] [--nav OUT.nav]
+"""
+import os
+import math
+import argparse
+from datetime import datetime, timedelta, timezone
+from pyubx2 import UBXReader
+
+GPS_EPOCH = datetime(1980, 1, 6)
+SECONDS_PER_WEEK = 604800
+RINEX_VERSION = 3.04
+PROGRAM = "ubx2rinex"
+
+RAWX_ID = 0x0215
+SFRBX_ID = 0x0213
+
+# gnssId -> RINEX system letter
+SYSTEMS = {0: "G", 1: "S", 2: "E", 3: "C", 5: "J", 6: "R", 7: "I"}
+# (gnssId, sigId) -> RINEX band and attribute
+SIGNALS = {
+    (0, 0): "1C", (0, 3): "2L", (0, 4): "2S", (0, 6): "5I", (0, 7): "5Q",
+    (1, 0): "1C",
+    (2, 0): "1C", (2, 1): "1B", (2, 3): "5I", (2, 4): "5Q", (2, 5): "7I", (2, 6): "7Q",
+    (3, 0): "2I", (3, 1): "2I", (3, 2): "7I", (3, 3): "7I", (3, 5): "1P", (3, 7): "5P",
+    (5, 0): "1C", (5, 1): "1Z", (5, 4): "2S", (5, 5): "2L", (5, 8): "5I", (5, 9): "5Q",
+    (6, 0): "1C", (6, 2): "2C",
+    (7, 0): "5A",
+}
+OBS_KINDS = ("C", "L", "D", "S")   # pseudorange, phase, doppler, C/N0
+
+SC2RAD = math.pi    # semicircles to radians
+# GPS URA index -> metres (ICD-GPS-200 20.3.3.3.1.3)
+URA_METRES = (2.4, 3.4, 4.85, 6.85, 9.65, 13.65, 24.0, 48.0, 96.0, 192.0,
+              384.0, 768.0, 1536.0, 3072.0, 6144.0, 6144.0)
+
+
+def ubx_messages(path, msgfilter):
+    """Yield the parsed messages in ``msgfilter`` from a raw log, one at a time"""
+    with open(path, "rb") as stream:
+        reader = UBXReader(stream, protfilter=2, msgfilter=msgfilter,
+                           quitonerror=0)
+        while True:
+            raw_data, parsed_data = reader.read()
+            if raw_data is None:
+                return
+            if parsed_data is not None:
+                yield parsed_data
+
+
+def gps_time(week, tow):
+    """Calendar time (GPS time scale) of a GPS week and time of week"""
+    return GPS_EPOCH + timedelta(weeks=week, seconds=tow)
+
+
+def satellite_id(gnss_id, sv_id):
+    system = SYSTEMS.get(gnss_id)
+    if system is None or sv_id == 255:
+        return None
+    if system == "S":
+        sv_id -= 100
+    return f"{system}{sv_id:02d}"
+
+
+def rawx_epochs(messages):
+    """Yield (time, {satellite: {obs type: (value, lli, ssi)}}, glonass slots) per RAWX.
+
+    LLI bit 0 marks a lock-time reset since the previous epoch and bit 1 an
+    unresolved half-cycle ambiguity.
+    """
+    locktimes = {}
+    for msg in messages:
+        if msg.identity != "RXM-RAWX":
+            continue
+        observations = {}
+        slots = {}
+        for i in range(1, msg.numMeas + 1):
+            n = f"_{i:02d}"
+            gnss_id = getattr(msg, "gnssId" + n)
+            satellite = satellite_id(gnss_id, getattr(msg, "svId" + n))
+            code = SIGNALS.get((gnss_id, getattr(msg, "sigId" + n)))
+            if satellite is None or code is None:
+                continue
+            if satellite[0] == "R":
+                slots[satellite] = getattr(msg, "freqId" + n) - 7
+
+            key = (satellite, code)
+            locktime = getattr(msg, "locktime" + n)
+            lli = 1 if locktime < locktimes.get(key, 0) else 0
+            locktimes[key] = locktime
+            cno = getattr(msg, "cno" + n)
+            ssi = min(max(cno // 6, 1), 9)
+
+            obs = observations.setdefault(satellite, {})
+            if getattr(msg, "prValid" + n):
+                obs["C" + code] = (getattr(msg, "prMes" + n), 0, ssi)
+            if getattr(msg, "cpValid" + n):
+                if not getattr(msg, "halfCyc" + n):
+                    lli |= 2
+                obs["L" + code] = (getattr(msg, "cpMes" + n), lli, ssi)
+            obs["D" + code] = (getattr(msg, "doMes" + n), 0, ssi)
+            obs["S" + code] = (float(cno), 0, 0)
+        yield gps_time(msg.week, msg.rcvTow), observations, slots
+
+
+def scan_observations(path):
+    """First pass: observation types per system, first epoch and GLONASS slots"""
+    codes = {}
+    slots = {}
+    first = None
+    for epoch, observations, epoch_slots in rawx_epochs(ubx_messages(path, RAWX_ID)):
+        if first is None:
+            first = epoch
+        slots.update(epoch_slots)
+        for satellite, obs in observations.items():
+            codes.setdefault(satellite[0], set()).update(t[1:] for t in obs)
+    obs_types = {
+        system: [kind + code for code in sorted(system_codes) for kind in OBS_KINDS]
+        for system, system_codes in sorted(codes.items())
+    }
+    return obs_types, first, slots
+
+
+def header_line(content, label):
+    return f"{content:<60.60}{label:<20}\n"
+
+
+def program_line():
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d %H%M%S UTC")
+    return header_line(f"{PROGRAM:<20}{'':<20}{stamp}", "PGM / RUN BY / DATE")
+
+
+def observation_header(obs_types, first, slots):
+    yield header_line(f"{RINEX_VERSION:9.2f}{'':11}{'OBSERVATION DATA':<20}{'M':<20}",
+                      "RINEX VERSION / TYPE")
+    yield program_line()
+    yield header_line("", "MARKER NAME")
+    yield header_line("", "OBSERVER / AGENCY")
+    yield header_line(f"{'':<20}{'u-blox':<20}", "REC # / TYPE / VERS")
+    yield header_line("", "ANT # / TYPE")
+    yield header_line(f"{0.0:14.4f}{0.0:14.4f}{0.0:14.4f}", "APPROX POSITION XYZ")
+    yield header_line(f"{0.0:14.4f}{0.0:14.4f}{0.0:14.4f}", "ANTENNA: DELTA H/E/N")
+    for system, types in obs_types.items():
+        for start in range(0, len(types), 13):
+            prefix = f"{system}  {len(types):3d}" if start == 0 else " " * 6
+            fields = "".join(f" {t}" for t in types[start:start + 13])
+            yield header_line(prefix + fields, "SYS / # / OBS TYPES")
+    seconds = first.second + first.microsecond / 1e6
+    yield header_line(
+        f"{first.year:6d}{first.month:6d}{first.day:6d}{first.hour:6d}{first.minute:6d}"
+        f"{seconds:13.7f}{'':5}GPS", "TIME OF FIRST OBS")
+    for system in obs_types:
+        yield header_line(system, "SYS / PHASE SHIFT")
+    glonass = sorted(slots.items())
+    for start in range(0, max(len(glonass), 1), 8):
+        prefix = f"{len(glonass):3d} " if start == 0 else " " * 4
+        fields = "".join(f"{sat} {k:2d} " for sat, k in glonass[start:start + 8])
+        yield header_line(prefix + fields, "GLONASS SLOT / FRQ #")
+    yield header_line(" C1C    0.000 C1P    0.000 C2C    0.000 C2P    0.000",
+                      "GLONASS COD/PHS/BIS")
+    yield header_line("", "END OF HEADER")
+
+
+def observation_records(epochs, obs_types):
+    """Yield the RINEX lines of each epoch"""
+    for epoch, observations, _ in epochs:
+        satellites = sorted(sat for sat in observations if sat[0] in obs_types)
+        seconds = epoch.second + epoch.microsecond / 1e6
+        yield (f"> {epoch.year:4d} {epoch.month:02d} {epoch.day:02d} {epoch.hour:02d}"
+               f" {epoch.minute:02d}{seconds:11.7f}  0{len(satellites):3d}\n")
+        for satellite in satellites:
+            obs = observations[satellite]
+            fields = []
+            for obs_type in obs_types[satellite[0]]:
+                value = obs.get(obs_type)
+                if value is None:
+                    fields.append(" " * 16)
+                else:
+                    value, lli, ssi = value
+                    fields.append(f"{value:14.3f}{lli or ' '}{ssi or ' '}")
+            yield (satellite + "".join(fields)).rstrip() + "\n"
+
+
+def write_observations(path, out_path):
+    obs_types, first, slots = scan_observations(path)
+    if first is None:
+        print(f"No RXM-RAWX messages in {path}")
+        return False
+    with open(out_path, "w") as f:
+        f.writelines(observation_header(obs_types, first, slots))
+        f.writelines(observation_records(
+            rawx_epochs(ubx_messages(path, RAWX_ID)), obs_types))
+    return True
+
+
+def getbitu(data, pos, length):
+    """Unsigned bit field of a 240-bit LNAV subframe held in an int"""
+    return (data >> (240 - pos - length)) & ((1 << length) - 1)
+
+
+def getbits(data, pos, length):
+    value = getbitu(data, pos, length)
+    return value - (1 << length) if value & (1 << (length - 1)) else value
+
+
+def lnav_subframe(msg):
+    """The 240 data bits of a GPS LNAV subframe as an int, or None"""
+    if msg.numWords != 10:
+        return None
+    subframe = 0
+    for i in range(1, 11):
+        subframe = (subframe << 24) | ((getattr(msg, f"dwrd_{i:02d}") >> 6) & 0xFFFFFF)
+    if getbitu(subframe, 0, 8) != 0x8B:     # TLM preamble
+        return None
+    return subframe
+
+
+def decode_ephemeris(sf1, sf2, sf3):
+    """Clock and orbit parameters from LNAV subframes 1-3 (ICD-GPS-200 20.3.3)"""
+    tgd = getbits(sf1, 160, 8)
+    eph = {
+        "week": getbitu(sf1, 48, 10),
+        "l2codes": getbitu(sf1, 58, 2),
+        "ura": URA_METRES[getbitu(sf1, 60, 4)],
+        "health": getbitu(sf1, 64, 6),
+        "iodc": (getbitu(sf1, 70, 2) << 8) | getbitu(sf1, 168, 8),
+        "l2p": getbitu(sf1, 72, 1),
+        "tgd": 0.0 if tgd == -128 else tgd * 2 ** -31,
+        "toc": getbitu(sf1, 176, 16) * 16.0,
+        "af2": getbits(sf1, 192, 8) * 2 ** -55,
+        "af1": getbits(sf1, 200, 16) * 2 ** -43,
+        "af0": getbits(sf1, 216, 22) * 2 ** -31,
+        "iode": getbitu(sf2, 48, 8),
+        "crs": getbits(sf2, 56, 16) * 2 ** -5,
+        "deln": getbits(sf2, 72, 16) * 2 ** -43 * SC2RAD,
+        "m0": getbits(sf2, 88, 32) * 2 ** -31 * SC2RAD,
+        "cuc": getbits(sf2, 120, 16) * 2 ** -29,
+        "e": getbitu(sf2, 136, 32) * 2 ** -33,
+        "cus": getbits(sf2, 168, 16) * 2 ** -29,
+        "sqrta": getbitu(sf2, 184, 32) * 2 ** -19,
+        "toe": getbitu(sf2, 216, 16) * 16.0,
+        "fit": getbitu(sf2, 232, 1),
+        "cic": getbits(sf3, 48, 16) * 2 ** -29,
+        "omega0": getbits(sf3, 64, 32) * 2 ** -31 * SC2RAD,
+        "cis": getbits(sf3, 96, 16) * 2 ** -29,
+        "i0": getbits(sf3, 112, 32) * 2 ** -31 * SC2RAD,
+        "crc": getbits(sf3, 144, 16) * 2 ** -5,
+        "omega": getbits(sf3, 160, 32) * 2 ** -31 * SC2RAD,
+        "omegadot": getbits(sf3, 192, 24) * 2 ** -43 * SC2RAD,
+        "idot": getbits(sf3, 224, 14) * 2 ** -43 * SC2RAD,
+        # Transmission time: HOW carries the TOW of the next subframe
+        "tot": getbitu(sf1, 24, 17) * 6.0 - 6.0,
+    }
+    if getbitu(sf3, 216, 8) != eph["iode"] or eph["iodc"] & 0xFF != eph["iode"]:
+        return None
+    return eph
+
+
+def gps_ephemerides(messages):
+    """Yield (satellite, week, ephemeris) each time a new GPS ephemeris set completes"""
+    week = None
+    subframes = {}
+    last_iode = {}
+    for msg in messages:
+        if msg.identity == "RXM-RAWX":
+            week = msg.week
+            continue
+        if msg.identity != "RXM-SFRBX" or msg.gnssId != 0 or week is None:
+            continue
+        subframe = lnav_subframe(msg)
+        if subframe is None:
+            continue
+        subframe_id = getbitu(subframe, 43, 3)
+        if subframe_id not in (1, 2, 3):
+            continue
+
+        satellite = satellite_id(0, msg.svId)
+        frames = subframes.setdefault(satellite, {})
+        frames[subframe_id] = subframe
+        if len(frames) < 3:
+            continue
+        eph = decode_ephemeris(frames[1], frames[2], frames[3])
+        if eph is None or last_iode.get(satellite) == eph["iode"]:
+            continue
+        last_iode[satellite] = eph["iode"]
+        # Resolve the 10-bit broadcast week against the receiver week
+        eph_week = week - ((week - eph["week"]) % 1024)
+        yield satellite, eph_week, eph
+
+
+def navigation_records(ephemerides):
+    def line(values):
+        return "    " + "".join(f"{v:19.12E}" for v in values) + "\n"
+
+    for satellite, week, eph in ephemerides:
+        toc_week = week
+        if eph["toc"] - eph["tot"] > SECONDS_PER_WEEK / 2:
+            toc_week -= 1
+        elif eph["toc"] - eph["tot"] < -SECONDS_PER_WEEK / 2:
+            toc_week += 1
+        toc = gps_time(toc_week, eph["toc"])
+        yield (f"{satellite} {toc.year:4d} {toc.month:02d} {toc.day:02d} {toc.hour:02d}"
+               f" {toc.minute:02d} {toc.second:02d}"
+               + "".join(f"{eph[k]:19.12E}" for k in ("af0", "af1", "af2")) + "\n")
+        yield line((eph["iode"], eph["crs"], eph["deln"], eph["m0"]))
+        yield line((eph["cuc"], eph["e"], eph["cus"], eph["sqrta"]))
+        yield line((eph["toe"], eph["cic"], eph["omega0"], eph["cis"]))
+        yield line((eph["i0"], eph["crc"], eph["omega"], eph["omegadot"]))
+        yield line((eph["idot"], eph["l2codes"], toc_week, eph["l2p"]))
+        yield line((eph["ura"], eph["health"], eph["tgd"], eph["iodc"]))
+        yield line((eph["tot"], 4.0 if eph["fit"] == 0 else 6.0))
+
+
+def write_navigation(path, out_path):
+    with open(out_path, "w") as f:
+        f.write(header_line(f"{RINEX_VERSION:9.2f}{'':11}{'N: GNSS NAV DATA':<20}{'G: GPS':<20}",
+                            "RINEX VERSION / TYPE"))
+        f.write(program_line())
+        f.write(header_line("", "END OF HEADER"))
+        f.writelines(navigation_records(
+            gps_ephemerides(ubx_messages(path, (RAWX_ID, SFRBX_ID)))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert a raw u-blox log into RINEX 3 observation/navigation files")
+    parser.add_argument("input", help="Raw .ubx log recorded by the Ublox driver")
+    parser.add_argument("--obs", help="Observation output (default: <input>.obs)")
+    parser.add_argument("--nav", help="Navigation output (default: <input>.nav)")
+    args = parser.parse_args()
+
+    base_path = os.path.splitext(args.input)[0]
+    obs_path = args.obs or f"{base_path}.obs"
+    nav_path = args.nav or f"{base_path}.nav"
+    if write_observations(args.input, obs_path):
+        print(f"Observations: {obs_path}")
+    write_navigation(args.input, nav_path)
+    print(f"Navigation (GPS LNAV): {nav_path}")
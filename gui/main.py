@@ -1,13 +1,18 @@
 # main.py
+import os
 import sys
-from PySide6.QtWidgets import QApplication, QMainWindow
-# this is the auto-generated file from Qt Designer
-from src.mainwindow import MainWindow
+# The sensor drivers live in the acquisition package at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import logging
 logging.basicConfig(level=logging.DEBUG)  # or INFO
 logger = logging.getLogger(__name__)
 
 if __name__ == "__main__":
+    # Qt is imported here so sensor processes started with spawn, which
+    # re-import this module, do not load it
+    from PySide6.QtWidgets import QApplication
+    # this is the auto-generated file from Qt Designer
+    from src.mainwindow import MainWindow
     try:
         app = QApplication(sys.argv)
         window = MainWindow()  # should be a proper QMainWindow subclass
@@ -8,7 +8,7 @@ icon = assets/icon.png
 
 [python]
 python_path = venv/bin/python
-packages = Nuitka,numpy,scipy,pyserial,pyubx2,pysbf2,pygnssutils,mscl
+packages = Nuitka,numpy,pyserial,pyubx2,pysbf2,pygnssutils,mscl
 android_packages = 
 
 [qt]
@@ -25,7 +25,7 @@ plugins =
 [nuitka]
 mode = onefile
 macos.permissions = 
-extra_args = --quiet --noinclude-qt-translations --static-libpython=no --include-package=mscl --include-module=mscl._mscl --jobs=2
+extra_args = --quiet --noinclude-qt-translations --static-libpython=no --include-package=mscl --include-module=mscl._mscl --include-package=acquisition --jobs=2
 
 [buildozer]
 mode = onefile
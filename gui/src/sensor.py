@@ -12,12 +12,10 @@ import math
 import sys
 import os
 
-from src.serial.microstrain import Microstrain
-from src.serial.witmotion import WitMotion
-from src.serial.ublox import Ublox
 from src.ui.ui_sensor import Ui_Sensor
-from src.utils.helpers import Bridge, PrintStream
+from src.utils.helpers import Bridge, PrintStream, DISPLAY_RATE
 from src.utils.bluetooth import Bluetooth
+from acquisition.snapshot import Snapshot
 from PySide6.QtGui import QStandardItem, QStandardItemModel
 
 
@@ -65,7 +63,6 @@ class Sensor(QWidget):
 
         self.gps_error_queue = Queue()
         self.imu_error_queue = Queue()
-        self.imu_queue = Queue()
 
         self.error_timer = QTimer()
         self.error_timer.timeout.connect(self.check_error_queues)
@@ -256,10 +253,10 @@ class Sensor(QWidget):
         if gpsport != "None" and gpstype != "None" and gpsbaud != 0:
             gps = True
             gpsport = f"/dev/{gpsport}"
-            self.gps_queue = Queue()
-            self.gps_bridge = Bridge(self.gps_queue)
+            self.gps_bridge = Bridge(Snapshot.create())
             self.gps_bridge.lastData.connect(self.displayGPSData)
 
+            from acquisition.ublox import Ublox
             if gpstype == "Fusion":
                 self.gps_process = Process(
                     target=Ublox,
@@ -270,9 +267,9 @@ class Sensor(QWidget):
                         "save_data": save,
                         "save_path": recording_path,
                         "ntrip_details": self.mainWindow.ntrip_details,
-                        "gps_queue": self.gps_queue,
+                        "snapshot": self.gps_bridge.snapshot.name,
                         "gps_error_queue": self.gps_error_queue,
-                        "display_timer": 0.1,
+                        "display_timer": 1 / DISPLAY_RATE,
                     }
                 )
                 self.gps_process.start()
@@ -286,9 +283,9 @@ class Sensor(QWidget):
                         "save_data": save,
                         "save_path": recording_path,
                         "ntrip_details": self.mainWindow.ntrip_details,
-                        "gps_queue": self.gps_queue,
+                        "snapshot": self.gps_bridge.snapshot.name,
                         "gps_error_queue": self.gps_error_queue,
-                        "display_timer": 0.1,
+                        "display_timer": 1 / DISPLAY_RATE,
 
                     }
                 )
@@ -302,11 +299,11 @@ class Sensor(QWidget):
         if imuport != "None" and imutype != "None" and imubaud != 0:
             imu = True
             imuport = f"/dev/{imuport}"
-            self.imu_queue = Queue()
-            self.imu_bridge = Bridge(self.imu_queue)
+            self.imu_bridge = Bridge(Snapshot.create())
             self.imu_bridge.lastData.connect(self.displayIMUData)
 
             if imutype == "WitMotion":
+                from acquisition.witmotion import WitMotion
                 self.imu_process = Process(
                     target=WitMotion,
                     kwargs={
@@ -314,14 +311,15 @@ class Sensor(QWidget):
                         "baud_rate": imubaud,
                         "save_data": save,
                         "save_path": recording_path,
-                        "imu_queue": self.imu_queue,
+                        "snapshot": self.imu_bridge.snapshot.name,
                         "imu_error_queue": self.imu_error_queue,
-                        "display_timer": 0.1,
+                        "display_timer": 1 / DISPLAY_RATE,
 
                     }
                 )
                 self.imu_process.start()
             elif imutype == "Microstrain CV7":
+                from acquisition.microstrain import Microstrain  # Loads mscl
                 self.imu_process = Process(
                     target=Microstrain,
                     kwargs={
@@ -329,9 +327,9 @@ class Sensor(QWidget):
                         "baud_rate": imubaud,
                         "save_data": save,
                         "save_path": recording_path,
-                        "imu_queue": self.imu_queue,
+                        "snapshot": self.imu_bridge.snapshot.name,
                         "imu_error_queue": self.imu_error_queue,
-                        "display_timer": 0.1,
+                        "display_timer": 1 / DISPLAY_RATE,
 
                     }
                 )
@@ -366,17 +364,12 @@ class Sensor(QWidget):
             self.printer.print(
                 "IMU process stopped.", "green")
 
-        # Clean up queues and bridges
-        if hasattr(self, "gps_queue"):
-            self.gps_queue.close()
-            self.gps_queue.join_thread()
-        if hasattr(self, "imu_queue"):
-            self.imu_queue.close()
-            self.imu_queue.join_thread()
-
+        # Clean up bridges and their snapshots
         if hasattr(self, "gps_bridge"):
+            self.gps_bridge.close()
             self.gps_bridge.deleteLater()
         if hasattr(self, "imu_bridge"):
+            self.imu_bridge.close()
             self.imu_bridge.deleteLater()
 
         # UI buttons
@@ -416,24 +409,26 @@ class Sensor(QWidget):
             self.printer.print(status, "red")
         elif "Connected" in status:
             self.printer.print("Bluetooth connection established.", "green")
-            self.printer.print(
-                f"{self.bluetooth.current_service_info.serviceName()} service found.", "green")
+            if self.bluetooth.current_service_info is not None:
+                self.printer.print(
+                    f"{self.bluetooth.current_service_info.serviceName()} service found.", "green")
             currentTime = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
             recording_path = os.path.join(
                 self.mainWindow.recording_path, currentTime)
-            self.imu_queue = Queue()
-            self.imu_bridge = Bridge(self.imu_queue)
+            self.imu_bridge = Bridge(Snapshot.create())
             self.imu_bridge.lastData.connect(self.displayIMUData)
 
+            from acquisition.witmotion import WitMotion
             self.imu_process = Process(
                 target=WitMotion,
                 kwargs={
                     "socket": self.bluetooth.raw_queue,
+                    "protocol": self.bluetooth.protocol,
                     "save_data": self.bluetooth.save,
                     "save_path": recording_path,
-                    "imu_queue": self.imu_queue,
+                    "snapshot": self.imu_bridge.snapshot.name,
                     "imu_error_queue": self.imu_error_queue,
-                    "display_timer": 0.1,
+                    "display_timer": 1 / DISPLAY_RATE,
 
                 }
             )
@@ -460,7 +455,7 @@ class Sensor(QWidget):
 
     @Slot()
     def on_BLETerminationButton_clicked(self):
-        if hasattr(self.bluetooth, "socket") and self.bluetooth.socket.isOpen():
+        if self.bluetooth.is_connected():
             print('Disconnecting Bluetooth')
             self.bluetooth.disconnect()
             if hasattr(self, "imu_process") and self.imu_process.is_alive():
@@ -472,11 +467,8 @@ class Sensor(QWidget):
                 self.printer.print(
                     "IMU process stopped.", "green")
 
-            if hasattr(self, "imu_queue"):
-                self.imu_queue.close()
-                self.imu_queue.join_thread()
-
             if hasattr(self, "imu_bridge"):
+                self.imu_bridge.close()
                 self.imu_bridge.deleteLater()
 
             self.printer.print("Bluetooth connection closed.", "green")
@@ -1,11 +1,22 @@
-from PySide6.QtCore import QObject, Signal, Slot, Qt
+import time
+from PySide6.QtCore import QByteArray, QObject, QTimer, QUuid, Signal, Slot, Qt
 from PySide6.QtGui import QColor
 from PySide6.QtBluetooth import (
     QBluetoothAddress, QBluetoothDeviceDiscoveryAgent, QBluetoothDeviceInfo,
     QBluetoothLocalDevice, QBluetoothServiceDiscoveryAgent, QBluetoothServiceInfo,
-    QBluetoothSocket
+    QBluetoothSocket, QBluetoothUuid, QLowEnergyCharacteristic, QLowEnergyController,
+    QLowEnergyService
 )
 from multiprocessing import Queue
+from acquisition.witmotion import WitMotionBLEFramer, WitMotionFramer
+
+FLUSH_INTERVAL = 20  # ms between batches pushed to the IMU process
+
+# WitMotion BLE 5.0 GATT service: data arrives as notifications on FFE4
+WITMOTION_SERVICE_UUID = QBluetoothUuid(
+    QUuid("{0000ffe5-0000-1000-8000-00805f9a34fb}"))
+WITMOTION_NOTIFY_UUID = QBluetoothUuid(
+    QUuid("{0000ffe4-0000-1000-8000-00805f9a34fb}"))
 
 
 class Bluetooth(QObject):
@@ -20,9 +31,16 @@ class Bluetooth(QObject):
         self.device_agent = QBluetoothDeviceDiscoveryAgent()
         self.service_agent = None
         self.socket = None
+        self.controller = None
+        self.ble_service = None
+        self.protocol = "serial"  # WitMotion frame format of the open connection
         self.current_service_info = None
         self.devices = {}  # {address_str: QBluetoothDeviceInfo}
         self.raw_queue = Queue()
+        self._framer = WitMotionFramer()
+        self._batch = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.timeout.connect(self._flush_batch)
 
         self.device_agent.deviceDiscovered.connect(self._on_device_discovered)
         #self.device_agent.finished.connect(lambda: self.scanFinished.emit())
@@ -74,42 +92,113 @@ class Bluetooth(QObject):
         self.socket = QBluetoothSocket(QBluetoothServiceInfo.RfcommProtocol)
         self.socket.connected.connect(lambda: self.connectionStatus.emit("Connected"))
         self.socket.readyRead.connect(self._read_socket_data)
+        self._start_batching(WitMotionFramer(), "serial")
         # self.socket.errorOccurred.connect(lambda err: self.connectionStatus.emit(
         #     f"Socket error: {self.socket.errorString()}"))
         self.socket.errorOccurred.connect(lambda err: print(f"Socket error: {self.socket.errorString()}"))
 
         self.socket.connectToService(self.current_service_info)
 
+    def _connect_low_energy(self, info: QBluetoothDeviceInfo):
+        self.controller = QLowEnergyController.createCentral(info, self)
+        self.controller.connected.connect(self.controller.discoverServices)
+        self.controller.discoveryFinished.connect(self._on_gatt_discovery_finished)
+        self.controller.disconnected.connect(
+            lambda: self.connectionStatus.emit("Disconnected"))
+        self.controller.errorOccurred.connect(
+            lambda err: print(f"BLE error: {self.controller.errorString()}"))
+        self.controller.connectToDevice()
+        self.connectionStatus.emit(
+            f"Connecting to {info.address().toString()} over BLE...")
+
+    @Slot()
+    def _on_gatt_discovery_finished(self):
+        self.ble_service = self.controller.createServiceObject(
+            WITMOTION_SERVICE_UUID, self)
+        if not self.ble_service:
+            self.connectionStatus.emit("No valid service found")
+            return
+
+        self.ble_service.stateChanged.connect(self._on_gatt_service_state)
+        self.ble_service.characteristicChanged.connect(self._read_notification)
+        self.ble_service.discoverDetails()
+
+    @Slot(QLowEnergyService.ServiceState)
+    def _on_gatt_service_state(self, state):
+        if state != QLowEnergyService.ServiceState.RemoteServiceDiscovered:
+            return
+
+        characteristic = self.ble_service.characteristic(WITMOTION_NOTIFY_UUID)
+        descriptor = characteristic.descriptor(
+            QBluetoothUuid.DescriptorType.ClientCharacteristicConfiguration)
+        if not characteristic.isValid() or not descriptor.isValid():
+            self.connectionStatus.emit("No valid service found")
+            return
+
+        self._start_batching(WitMotionBLEFramer(), "ble")
+        self.ble_service.writeDescriptor(
+            descriptor, QLowEnergyCharacteristic.CCCDEnableNotification)
+        self.connectionStatus.emit("Connected")
+
+    @Slot(QLowEnergyCharacteristic, QByteArray)
+    def _read_notification(self, characteristic, value):
+        self._queue_data(value.data())
+
     @Slot()
     def _read_socket_data(self):
-        set_ = True
-        while self.socket and self.socket.canReadLine():
-            try:
-                if set_:
-                    while True:
-                        q = self.socket.read(1)
-                        if not q:
-                            return  # No data, exit or wait for next readyRead signal
-                        if q[0] == b'U':  # sync byte found
-                            set_ = False
-                            break
-                packet = self.socket.read(11)
-                if len(packet) > 10:
-                    self.raw_queue.put(packet.data())
-                else:
-                    print("Incomplete packet, resetting sync...")
-                    set_ = True  # always reset to look for sync again
-
-            except Exception as e:
-                print(f"Socket Read Error: {e}")
-                set_ = True  # Reset sync on error
+        if not self.socket:
+            return
+        try:
+            self._queue_data(self.socket.readAll().data())
+        except Exception as e:
+            print(f"Socket Read Error: {e}")
+
+    def _start_batching(self, framer, protocol):
+        self._framer = framer
+        self.protocol = protocol
+        self._batch = []
+        self._flush_timer.start(FLUSH_INTERVAL)
+
+    def _queue_data(self, data):
+        if not data:
+            return
+        discarded = self._framer.discarded
+        frames = self._framer.feed(data)
+        if frames:
+            self._batch.append((time.time(), frames))
+        if self._framer.discarded != discarded:
+            print(f"Bluetooth resync: discarded {self._framer.discarded - discarded} bytes")
+
+    @Slot()
+    def _flush_batch(self):
+        # One queue put per interval instead of one per packet
+        if self._batch:
+            self.raw_queue.put(self._batch)
+            self._batch = []
+
+    def is_connected(self):
+        if self.socket:
+            return self.socket.isOpen()
+        return self.controller is not None and \
+            self.controller.state() != QLowEnergyController.ControllerState.UnconnectedState
 
     def disconnect(self):
+        self._flush_timer.stop()
         if self.socket:
             self.socket.disconnectFromService()
             self.socket.deleteLater()
             self.socket = None
             self.connectionStatus.emit("Disconnected")
+        if self.controller:
+            self.controller.disconnectFromDevice()
+            self.controller.deleteLater()
+            self.controller = None
+            self.ble_service = None
 
     def connect(self, address_str: str):
-        self.discover_services(address_str)
\ No newline at end of file
+        info = self.devices.get(address_str)
+        if info is not None and \
+                info.coreConfigurations() & QBluetoothDeviceInfo.CoreConfiguration.LowEnergyCoreConfiguration:
+            self._connect_low_energy(info)
+        else:
+            self.discover_services(address_str)
\ No newline at end of file
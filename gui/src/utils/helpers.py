@@ -2,21 +2,31 @@ from PySide6.QtCore import QObject, Signal, QTimer, Qt
 from PySide6.QtWidgets import QTextBrowser
 
 
+DISPLAY_RATE = 30  # Hz
+
+
 class Bridge(QObject):
+    """Emits the latest row of a Snapshot, only when it changed"""
     lastData = Signal(object)
 
-    def __init__(self, queue):
+    def __init__(self, snapshot):
         super().__init__()
-        self.queue = queue
+        self.snapshot = snapshot
+        self.version = 0
         self.timer = QTimer()
         self.timer.timeout.connect(self.poll)
-        self.timer.start(100)  # adjust poll rate (ms) as needed
+        self.timer.start(1000 // DISPLAY_RATE)
 
     def poll(self):
-        while not self.queue.empty():
-            data = self.queue.get()
+        self.version, data = self.snapshot.read_if_changed(self.version)
+        if data is not None:
             self.lastData.emit(data)
 
+    def close(self):
+        """Stop polling and unmap the snapshot"""
+        self.timer.stop()
+        self.snapshot.close()
+
 
 class PrintStream(QObject):
     message_signal = Signal(str, str)